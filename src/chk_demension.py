@@ -7,10 +7,17 @@ CAD-Work 프로젝트
 """
 
 import ezdxf
+from ezdxf import recover
+import gzip
 import math
+import os
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from collections import defaultdict
-from itertools import combinations
+from functools import lru_cache
+from point_grid import PointGrid
 
 
 # ============================================================================
@@ -20,7 +27,8 @@ from itertools import combinations
 # 파일 경로 설정 (직접 지정)
 #INPUT_FILE = "data\\gear-disk\\Gear Disk dxf File.dxf"  # 분석할 DXF 파일
 INPUT_FILE = "data\\doosan\\test-002.dxf"  # 분석할 DXF 파일
-OUTPUT_REPORT = "analysis_report.txt"  # 출력 보고서 파일명
+OUTPUT_REPORT = "analysis_report.txt"  # 출력 보고서 파일명 (.gz로 지정하면 gzip 압축해서 저장)
+REPORT_BUFFER_SIZE = 1024 * 1024  # 보고서 파일 쓰기 버퍼 크기 (bytes)
 
 ON_DETECT_EX_LEADERS = False  # 지시선이 아닌 직선을 대상으로 지시선의 역할을 찾는다
 
@@ -31,6 +39,7 @@ CONFIG = {
         'barb_length_diff_max': 0.2,    # 대칭선 길이 차이 허용 오차 (mm)
         'arrow_angle_max': 75.0,        # 주축선과 대칭선 최대 각도 (도)
         'barb_angle_diff_max': 0.5,     # 두 대칭선 각도 차이 허용 오차 (도)
+        'parallel_workers': 1,          # 만나는 선분 검색 프로세스 수 (1=단일 프로세스, 0=CPU 수)
     },
     'ARROW_CONNECTED_LINE': {
         'max_gap': 3.0,                 # 직선 연결 최대 간격 (mm)
@@ -53,6 +62,8 @@ CONFIG = {
 
 class Point:
     """점 좌표"""
+    __slots__ = ('x', 'y')
+    
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -63,7 +74,11 @@ class Point:
 
 class Line:
     """선분"""
-    def __init__(self, start, end, handle=None, layer=None, color=None, lineweight=None, linetype=None, line_id=None):
+    __slots__ = ('start_point', 'end_point', 'handle', 'layer', 'color', 'lineweight', 'linetype', 'id', 'idx',
+                 'dx', 'dy', 'len2', 'length')
+    
+    def __init__(self, start, end, handle=None, layer=None, color=None, lineweight=None, linetype=None, line_id=None,
+                 line_idx=None):
         self.start_point = start if isinstance(start, Point) else Point(start[0], start[1])
         self.end_point = end if isinstance(end, Point) else Point(end[0], end[1])
         self.handle = handle
@@ -72,13 +87,44 @@ class Line:
         self.lineweight = lineweight  # 선 두께 (-3=기본, -2=bylayer, -1=byblock, 0-211=실제값)
         self.linetype = linetype     # 선 종류 (Continuous, Dashed 등)
         self.id = line_id           # 라인 ID (배열 인덱스 기반)
+        self.idx = line_idx         # LineArray 행 인덱스
+        
+        # 방향 벡터와 길이 (선분은 생성 후 변경되지 않으므로 한 번만 계산)
+        self.dx = self.end_point.x - self.start_point.x
+        self.dy = self.end_point.y - self.start_point.y
+        self.len2 = self.dx*self.dx + self.dy*self.dy
+        self.length = math.hypot(self.dx, self.dy)
     
     def __repr__(self):
         return f"Line[ID:{self.id}, {self.start_point} → {self.end_point}]"
 
 
+class LineArray:
+    """
+    전체 선분의 좌표/방향/길이를 NumPy 배열로 모아 둔 구조 (SoA)
+    - 행 인덱스 = Line.idx
+    - 벡터 연산(화살표 탐지, 지시경계선 탐지)은 Line 객체 대신 이 배열을 사용
+    """
+    __slots__ = ('starts', 'ends', 'dirs', 'lengths', 'angles')
+    
+    def __init__(self, starts, ends, lengths):
+        self.starts = starts            # 시작점 좌표 (N×2)
+        self.ends = ends                # 끝점 좌표 (N×2)
+        self.dirs = ends - starts       # 방향 벡터 (N×2)
+        self.lengths = lengths          # 길이 (N,) - Line.length와 같은 값
+        self.angles = np.arctan2(self.dirs[:, 1], self.dirs[:, 0])  # 방향각 (N,, 라디안)
+    
+    def __len__(self):
+        return len(self.lengths)
+    
+    def __repr__(self):
+        return f"LineArray[{len(self)}개 선분]"
+
+
 class Arrow:
     """화살표 (주축선 + 화살촉)"""
+    __slots__ = ('shaft', 'left_barb', 'right_barb', 'tip_point', 'direction', 'id')
+    
     def __init__(self, shaft, left_barb, right_barb, tip_point, direction='end'):
         self.shaft = shaft
         self.left_barb = left_barb
@@ -93,6 +139,10 @@ class Arrow:
 
 class TextEntity:
     """텍스트 엔티티"""
+    __slots__ = ('handle', 'content', 'position', 'layer', 'entity_type',
+                 'color', 'style', 'rotation', 'height', 'width', 'halign', 'valign',
+                 'char_height', 'line_spacing_factor', 'attachment_point', 'matched_arrows')
+    
     def __init__(self, handle, content, position, layer, entity_type='TEXT',
                  color=None, style=None, height=None, rotation=None, 
                  width=None, halign=None, valign=None,
@@ -127,6 +177,8 @@ class TextEntity:
 
 class ArrowLeader:
     """지시화살표선"""
+    __slots__ = ('arrow', 'leader_position', 'line_chain', 'matched_text', 'matched_boundaries', 'id')
+    
     def __init__(self, arrow, leader_position, line_chain=None):
         self.arrow = arrow
         self.leader_position = leader_position
@@ -141,6 +193,8 @@ class ArrowLeader:
 
 class LeaderEntity:
     """LEADER 엔티티 (DXF의 LEADER)"""
+    __slots__ = ('handle', 'layer', 'vertices', 'has_arrowhead', 'color', 'linetype', 'matched_text', 'id')
+    
     def __init__(self, handle, layer, vertices, has_arrowhead=True, color=None, linetype=None):
         self.handle = handle
         self.layer = layer
@@ -165,6 +219,9 @@ class LeaderEntity:
 
 class PolylineEntity:
     """POLYLINE 또는 LWPOLYLINE 엔티티"""
+    __slots__ = ('handle', 'layer', 'vertices', 'is_closed', 'entity_type',
+                 'color', 'lineweight', 'linetype', 'id', '_vertex_xy')
+    
     def __init__(self, handle, layer, vertices, is_closed=False, entity_type='POLYLINE',
                  color=None, lineweight=None, linetype=None):
         self.handle = handle
@@ -176,6 +233,14 @@ class PolylineEntity:
         self.lineweight = lineweight
         self.linetype = linetype
         self.id = None
+        self._vertex_xy = None  # 꼭지점 좌표 배열 캐시 (vertex_array()에서 생성)
+    
+    def vertex_array(self):
+        """꼭지점 좌표 배열 (K×2, float64) - 처음 호출할 때 한 번만 생성"""
+        if self._vertex_xy is None:
+            self._vertex_xy = np.array([(v.x, v.y) for v in self.vertices],
+                                       dtype=np.float64).reshape(-1, 2)
+        return self._vertex_xy
     
     def get_segment_count(self):
         """세그먼트 개수"""
@@ -191,15 +256,15 @@ class PolylineEntity:
         if len(self.vertices) < 2:
             return 0.0
         
-        total = 0.0
-        for i in range(len(self.vertices) - 1):
-            total += distance(self.vertices[i], self.vertices[i + 1])
+        xy = self.vertex_array()
         
         # 닫힌 폴리라인이면 마지막과 첫 점 연결
         if self.is_closed:
-            total += distance(self.vertices[-1], self.vertices[0])
+            xy = np.vstack((xy, xy[:1]))
         
-        return total
+        # 세그먼트 길이를 한 번에 계산해서 합산
+        segments = np.diff(xy, axis=0)
+        return float(np.hypot(segments[:, 0], segments[:, 1]).sum())
     
     def __repr__(self):
         return f"{self.entity_type}[{self.id}, vertices={len(self.vertices)}, closed={self.is_closed}]"
@@ -211,22 +276,17 @@ class PolylineEntity:
 
 def length(line):
     """선분의 길이"""
-    dx = line.end_point.x - line.start_point.x
-    dy = line.end_point.y - line.start_point.y
-    return math.sqrt(dx*dx + dy*dy)
+    return line.length
 
 
 def distance(point1, point2):
     """두 점 사이의 거리"""
-    dx = point2.x - point1.x
-    dy = point2.y - point1.y
-    return math.sqrt(dx*dx + dy*dy)
+    return math.hypot(point2.x - point1.x, point2.y - point1.y)
 
 
 def direction_vector(line):
     """선분의 방향 벡터"""
-    return (line.end_point.x - line.start_point.x,
-            line.end_point.y - line.start_point.y)
+    return (line.dx, line.dy)
 
 
 def dot_product(v1, v2):
@@ -239,23 +299,74 @@ def angle_between(line1, line2):
     두 선분 사이의 각도 계산 (도 단위)
     Returns: 0° ~ 180°
     """
-    v1 = direction_vector(line1)
-    v2 = direction_vector(line2)
+    # angle = atan2(|v1 × v2|, v1 · v2) - sqrt, acos, 클램프 없이 계산 (0에 가까운 각도도 정확)
+    # 길이가 0인 선분이 있으면 외적/내적이 모두 0 → atan2(0, 0) = 0°
+    dot = line1.dx*line2.dx + line1.dy*line2.dy
+    cross = line1.dx*line2.dy - line1.dy*line2.dx
     
-    dot = dot_product(v1, v2)
-    mag1 = math.sqrt(v1[0]**2 + v1[1]**2)
-    mag2 = math.sqrt(v2[0]**2 + v2[1]**2)
+    return math.degrees(math.atan2(abs(cross), dot))
+
+
+def cos_angle(v1, v2):
+    """
+    두 벡터 사이 각도의 코사인 (acos 없이 각도 임계값과 비교할 때 사용)
+    Returns: -1.0 ~ 1.0 (길이가 0인 벡터가 있으면 angle_between과 같이 0°에 해당하는 1.0)
+    """
+    mag = math.hypot(v1[0], v1[1]) * math.hypot(v2[0], v2[1])
+    if mag == 0:
+        return 1.0
+    return max(-1.0, min(1.0, (v1[0]*v2[0] + v1[1]*v2[1]) / mag))
+
+
+def cos_angles_between(v1, v2):
+    """
+    방향 벡터 배열 사이 각도의 코사인 (cos_angle의 벡터화 버전)
     
-    if mag1 == 0 or mag2 == 0:
-        return 0
+    Args:
+        v1, v2: 방향 벡터 배열 (N×2) - 한쪽이 (2,)이면 브로드캐스트
     
-    cos_angle = dot / (mag1 * mag2)
-    cos_angle = max(-1.0, min(1.0, cos_angle))
+    Returns:
+        np.ndarray: -1.0 ~ 1.0 (길이가 0인 벡터가 있으면 1.0)
+    """
+    v1 = np.asarray(v1, dtype=np.float64)
+    v2 = np.asarray(v2, dtype=np.float64)
     
-    angle_rad = math.acos(cos_angle)
-    angle_deg = math.degrees(angle_rad)
+    dot = v1[..., 0] * v2[..., 0] + v1[..., 1] * v2[..., 1]
+    denom = np.hypot(v1[..., 0], v1[..., 1]) * np.hypot(v2[..., 0], v2[..., 1])
     
-    return angle_deg
+    cos_values = np.divide(dot, denom, out=np.ones_like(dot), where=denom != 0)
+    return np.clip(cos_values, -1.0, 1.0, out=cos_values)
+
+
+def fold_angle_diff(delta):
+    """방향각 차이(라디안 배열)를 두 선분 사이 각도 0 ~ π로 접기"""
+    delta = np.abs(delta)
+    return np.where(delta > np.pi, 2 * np.pi - delta, delta)
+
+
+def pair_cos(line_array, i_idx, j_idx):
+    """
+    선분 쌍 배열 사이 각도의 코사인 (LineArray에 저장된 길이 사용 - hypot 재계산 없음)
+    
+    Args:
+        line_array: 전체 선분 배열 (LineArray)
+        i_idx, j_idx: 선분 쌍 인덱스 배열 (P,)
+    
+    Returns:
+        np.ndarray: -1.0 ~ 1.0 (길이가 0인 선분이 있으면 1.0)
+    """
+    dirs = line_array.dirs
+    dot = dirs[i_idx, 0] * dirs[j_idx, 0] + dirs[i_idx, 1] * dirs[j_idx, 1]
+    mag = line_array.lengths[i_idx] * line_array.lengths[j_idx]
+    
+    cos_values = np.divide(dot, mag, out=np.ones_like(dot), where=mag != 0)
+    return np.clip(cos_values, -1.0, 1.0, out=cos_values)
+
+
+@lru_cache(maxsize=None)
+def _sin_of_degrees(angle_deg):
+    """각도 임계값(도)의 사인 - 같은 임계값으로 반복 호출되므로 캐시"""
+    return math.sin(math.radians(angle_deg))
 
 
 def are_lines_parallel(line1, line2, angle_threshold=5.0):
@@ -269,9 +380,12 @@ def are_lines_parallel(line1, line2, angle_threshold=5.0):
     Returns:
         bool: 평행이면 True
     """
-    angle = angle_between(line1, line2)
     # 각도가 0도 근처 또는 180도 근처면 평행
-    return angle < angle_threshold or angle > (180 - angle_threshold)
+    # |sin(angle)| = |v1 × v2| / (|v1||v2|) < sin(임계값) 을 나눗셈 없이 비교 (외적 1회)
+    # 길이가 0인 선분은 방향이 없으므로 평행으로 취급
+    mag = line1.length * line2.length
+    cross = line1.dx*line2.dy - line1.dy*line2.dx
+    return mag == 0 or abs(cross) < _sin_of_degrees(angle_threshold) * mag
 
 
 def get_leader_position(arrow_line, arrow_location):
@@ -301,85 +415,61 @@ def load_dxf_file(filename):
         print(f"✗ 파일을 찾을 수 없습니다: {filename}")
         return None
     except ezdxf.DXFStructureError:
+        pass
+    
+    # 구조 오류가 있는 파일은 복구 모드로 다시 시도 (복구 모드는 느리므로 실패할 때만 사용)
+    try:
+        doc, auditor = recover.readfile(filename)
+    except (IOError, ezdxf.DXFStructureError):
         print(f"✗ 잘못된 DXF 파일입니다: {filename}")
         return None
-
-
-def extract_layers(doc):
-    """레이어 정보 추출"""
-    layers = {}
-    msp = doc.modelspace()
-    
-    for entity in msp:
-        layer_name = entity.dxf.layer
-        if layer_name not in layers:
-            layers[layer_name] = {
-                'entity_count': 0,
-                'entity_types': set()
-            }
-        layers[layer_name]['entity_count'] += 1
-        layers[layer_name]['entity_types'].add(entity.dxftype())
-    
-    return layers
-
-
-def classify_entities(doc):
-    """엔티티 분류"""
-    msp = doc.modelspace()
-    entities = defaultdict(list)
     
-    for entity in msp:
-        entity_type = entity.dxftype()
-        entities[entity_type].append(entity)
-    
-    return entities
+    print(f"✓ DXF 파일 복구 로드: {filename} (수정 {len(auditor.fixes)}건, 오류 {len(auditor.errors)}건)")
+    print(f"  DXF 버전: {doc.dxfversion}")
+    return doc
 
 
-def extract_lines(entities):
-    """LINE 엔티티 추출 (색상, 두께, 선 종류 포함)"""
-    lines = []
-    for idx, entity in enumerate(entities.get('LINE', [])):
-        start = entity.dxf.start
-        end = entity.dxf.end
-        
-        # 색상 정보 추출 (기본값: None)
-        color = getattr(entity.dxf, 'color', None)
-        
-        # 선 두께 정보 추출 (기본값: None)
-        lineweight = getattr(entity.dxf, 'lineweight', None)
-        
-        # 선 종류 정보 추출 (기본값: None)
-        linetype = getattr(entity.dxf, 'linetype', None)
-        
-        line = Line(
-            Point(start[0], start[1]),
-            Point(end[0], end[1]),
-            handle=entity.dxf.handle,
-            layer=entity.dxf.layer,
-            color=color,
-            lineweight=lineweight,
-            linetype=linetype,
-            line_id=f"L{idx:04d}"  # 라인 ID 부여 (L0000, L0001, ...)
-        )
-        lines.append(line)
-    return lines
+def _intern(value):
+    """레이어명/선 종류/스타일처럼 반복되는 문자열은 sys.intern으로 공유 (None 등은 그대로)"""
+    return sys.intern(value) if isinstance(value, str) else value
 
 
-def extract_texts(entities):
-    """TEXT 및 MTEXT 엔티티 추출 (색상, 폰트, 크기 등 모든 속성 포함)"""
-    texts = []
+def line_from_entity(entity, idx, x1, y1, x2, y2):
+    """
+    LINE 엔티티 → Line 객체 (색상, 두께, 선 종류 포함)
     
-    # TEXT
-    for entity in entities.get('TEXT', []):
-        text = TextEntity(
+    Args:
+        entity: LINE 엔티티
+        idx: LINE 순번 (라인 ID 및 좌표 배열 인덱스)
+        x1, y1, x2, y2: 이미 읽어 둔 시작점/끝점 좌표 (dxf 속성 재조회 방지)
+    """
+    dxf = entity.dxf
+    
+    return Line(
+        Point(x1, y1),
+        Point(x2, y2),
+        handle=dxf.handle,
+        layer=_intern(dxf.layer),
+        color=getattr(dxf, 'color', None),            # 색상 정보 (기본값: None)
+        lineweight=getattr(dxf, 'lineweight', None),  # 선 두께 정보 (기본값: None)
+        linetype=_intern(getattr(dxf, 'linetype', None)),  # 선 종류 정보 (기본값: None)
+        line_id=f"L{idx:04d}",  # 라인 ID 부여 (L0000, L0001, ...)
+        line_idx=idx
+    )
+
+
+def text_from_entity(entity, entity_type):
+    """TEXT/MTEXT 엔티티 → TextEntity 객체 (색상, 폰트, 크기 등 모든 속성 포함)"""
+    if entity_type == 'TEXT':
+        return TextEntity(
             handle=entity.dxf.handle,
             content=entity.dxf.text,
             position=Point(entity.dxf.insert[0], entity.dxf.insert[1]),
-            layer=entity.dxf.layer,
+            layer=_intern(entity.dxf.layer),
             entity_type='TEXT',
             # 공통 속성
             color=getattr(entity.dxf, 'color', None),
-            style=getattr(entity.dxf, 'style', None),
+            style=_intern(getattr(entity.dxf, 'style', None)),
             rotation=getattr(entity.dxf, 'rotation', None),
             # TEXT 전용 속성
             height=getattr(entity.dxf, 'height', None),
@@ -387,198 +477,332 @@ def extract_texts(entities):
             halign=getattr(entity.dxf, 'halign', None),
             valign=getattr(entity.dxf, 'valign', None)
         )
-        texts.append(text)
     
-    # MTEXT
-    for entity in entities.get('MTEXT', []):
-        text = TextEntity(
-            handle=entity.dxf.handle,
-            content=entity.text,
-            position=Point(entity.dxf.insert[0], entity.dxf.insert[1]),
-            layer=entity.dxf.layer,
-            entity_type='MTEXT',
-            # 공통 속성
-            color=getattr(entity.dxf, 'color', None),
-            style=getattr(entity.dxf, 'style', None),
-            rotation=getattr(entity.dxf, 'rotation', None),
-            # MTEXT 전용 속성
-            char_height=getattr(entity.dxf, 'char_height', None),
-            width=getattr(entity.dxf, 'width', None),
-            line_spacing_factor=getattr(entity.dxf, 'line_spacing_factor', None),
-            attachment_point=getattr(entity.dxf, 'attachment_point', None)
-        )
-        texts.append(text)
-    
-    return texts
+    return TextEntity(
+        handle=entity.dxf.handle,
+        content=entity.text,
+        position=Point(entity.dxf.insert[0], entity.dxf.insert[1]),
+        layer=_intern(entity.dxf.layer),
+        entity_type='MTEXT',
+        # 공통 속성
+        color=getattr(entity.dxf, 'color', None),
+        style=_intern(getattr(entity.dxf, 'style', None)),
+        rotation=getattr(entity.dxf, 'rotation', None),
+        # MTEXT 전용 속성
+        char_height=getattr(entity.dxf, 'char_height', None),
+        width=getattr(entity.dxf, 'width', None),
+        line_spacing_factor=getattr(entity.dxf, 'line_spacing_factor', None),
+        attachment_point=getattr(entity.dxf, 'attachment_point', None)
+    )
 
 
-def extract_leaders(entities):
-    """LEADER 엔티티 추출"""
+def parse_modelspace(doc):
+    """
+    모델 공간을 한 번만 순회하며 레이어 정보 추출, 엔티티 분류, LINE/TEXT/LEADER/POLYLINE 추출을 함께 수행
+    
+    Returns:
+        tuple: (layers, entities, lines, line_array, texts, text_xy, leaders, polylines)
+            - layers: {레이어명: {'entity_count': int, 'entity_types': set}} (레이어명 순)
+            - entities: {엔티티 유형: [엔티티, ...]} (엔티티 유형 순)
+            - lines: Line 객체 리스트
+            - line_array: 선분 좌표/방향/길이 배열 (LineArray, 행 순서 = lines 순서)
+            - texts: TextEntity 객체 리스트 (TEXT → MTEXT 순)
+            - text_xy: 텍스트 위치 좌표 배열 (M×2, float64)
+            - leaders: LeaderEntity 객체 리스트
+            - polylines: PolylineEntity 객체 리스트 (POLYLINE → LWPOLYLINE 순)
+    """
+    msp = doc.modelspace()
+    layers = {}
+    entities = defaultdict(list)
+    
+    # 좌표 배열은 전체 엔티티 수를 상한으로 미리 할당한 뒤 마지막에 잘라냄
+    max_count = len(msp)
+    lines = []
+    line_starts = np.empty((max_count, 2), dtype=np.float64)
+    line_ends = np.empty((max_count, 2), dtype=np.float64)
+    line_lengths = np.empty(max_count, dtype=np.float64)
+    text_items = []
+    mtext_items = []
     leaders = []
+    polyline_items = []
+    lwpolyline_items = []
     
-    for idx, entity in enumerate(entities.get('LEADER', [])):
-        # 꼭지점 추출
-        vertices = []
-        for vertex in entity.vertices:
-            vertices.append(Point(vertex[0], vertex[1]))
+    for entity in msp:
+        entity_type = entity.DXFTYPE  # dxftype()이 반환하는 클래스 속성을 직접 읽음
         
-        # 화살촉 여부
-        has_arrowhead = getattr(entity.dxf, 'has_arrowhead', True)
+        # 레이어 정보
+        layer_name = entity.dxf.layer
+        layer_info = layers.get(layer_name)
+        if layer_info is None:
+            layer_info = layers[layer_name] = {
+                'entity_count': 0,
+                'entity_types': set()
+            }
+        layer_info['entity_count'] += 1
+        layer_info['entity_types'].add(entity_type)
         
-        # 색상 및 선 종류
-        color = getattr(entity.dxf, 'color', None)
-        linetype = getattr(entity.dxf, 'linetype', None)
+        # 엔티티 분류
+        entities[entity_type].append(entity)
         
-        leader = LeaderEntity(
-            handle=entity.dxf.handle,
-            layer=entity.dxf.layer,
-            vertices=vertices,
-            has_arrowhead=has_arrowhead,
-            color=color,
-            linetype=linetype
-        )
+        # LINE / TEXT / MTEXT 추출
+        if entity_type == 'LINE':
+            idx = len(lines)
+            start = entity.dxf.start
+            end = entity.dxf.end
+            x1, y1 = start.x, start.y
+            x2, y2 = end.x, end.y
+            line_starts[idx, 0] = x1
+            line_starts[idx, 1] = y1
+            line_ends[idx, 0] = x2
+            line_ends[idx, 1] = y2
+            line = line_from_entity(entity, idx, x1, y1, x2, y2)
+            line_lengths[idx] = line.length
+            lines.append(line)
+        elif entity_type == 'TEXT':
+            text_items.append(text_from_entity(entity, entity_type))
+        elif entity_type == 'MTEXT':
+            mtext_items.append(text_from_entity(entity, entity_type))
+        elif entity_type == 'LEADER':
+            leaders.append(leader_from_entity(entity))
+        elif entity_type == 'POLYLINE':
+            polyline_items.append(polyline_from_entity(entity, entity_type))
+        elif entity_type == 'LWPOLYLINE':
+            lwpolyline_items.append(polyline_from_entity(entity, entity_type))
+    
+    line_array = LineArray(line_starts[:len(lines)].copy(), line_ends[:len(lines)].copy(),
+                           line_lengths[:len(lines)].copy())
+    
+    texts = text_items + mtext_items
+    text_xy = np.array([(text.position.x, text.position.y) for text in texts],
+                       dtype=np.float64).reshape(-1, 2)
+    
+    # ID 부여
+    for idx, leader in enumerate(leaders):
         leader.id = f"LD{idx:03d}"
-        leaders.append(leader)
+    polylines = polyline_items + lwpolyline_items
+    for idx, polyline in enumerate(polylines):
+        polyline.id = f"PL{idx:04d}"
     
-    return leaders
+    # 출력(콘솔/보고서)은 항상 이름순이므로 여기서 한 번만 정렬해 둠
+    layers = dict(sorted(layers.items()))
+    entities = dict(sorted(entities.items()))
+    
+    return layers, entities, lines, line_array, texts, text_xy, leaders, polylines
 
 
-def extract_polylines(entities):
-    """POLYLINE 및 LWPOLYLINE 엔티티 추출"""
-    polylines = []
-    idx = 0
-    
-    # POLYLINE 추출
-    for entity in entities.get('POLYLINE', []):
+def leader_from_entity(entity):
+    """LEADER 엔티티 → LeaderEntity 객체 (ID는 호출하는 쪽에서 부여)"""
+    return LeaderEntity(
+        handle=entity.dxf.handle,
+        layer=_intern(entity.dxf.layer),
+        vertices=[Point(vertex[0], vertex[1]) for vertex in entity.vertices],  # 꼭지점 추출
+        has_arrowhead=getattr(entity.dxf, 'has_arrowhead', True),  # 화살촉 여부
+        color=getattr(entity.dxf, 'color', None),
+        linetype=_intern(getattr(entity.dxf, 'linetype', None))
+    )
+
+
+def polyline_from_entity(entity, entity_type):
+    """POLYLINE/LWPOLYLINE 엔티티 → PolylineEntity 객체 (ID는 호출하는 쪽에서 부여)"""
+    if entity_type == 'POLYLINE':
         # 꼭지점 추출
-        vertices = []
-        for vertex in entity:
-            location = vertex.dxf.location
-            vertices.append(Point(location[0], location[1]))
-        
-        # 닫힌 폴리라인 여부
+        vertices = [Point(vertex.dxf.location[0], vertex.dxf.location[1]) for vertex in entity]
         is_closed = entity.is_closed
-        
-        # 색상, 두께, 선 종류
-        color = getattr(entity.dxf, 'color', None)
         lineweight = getattr(entity.dxf, 'lineweight', None)
-        linetype = getattr(entity.dxf, 'linetype', None)
-        
-        polyline = PolylineEntity(
-            handle=entity.dxf.handle,
-            layer=entity.dxf.layer,
-            vertices=vertices,
-            is_closed=is_closed,
-            entity_type='POLYLINE',
-            color=color,
-            lineweight=lineweight,
-            linetype=linetype
-        )
-        polyline.id = f"PL{idx:04d}"
-        polylines.append(polyline)
-        idx += 1
-    
-    # LWPOLYLINE 추출
-    for entity in entities.get('LWPOLYLINE', []):
-        # 꼭지점 추출
-        vertices = []
-        for point in entity.get_points():
-            vertices.append(Point(point[0], point[1]))
-        
-        # 닫힌 폴리라인 여부
+    else:
+        vertices = [Point(point[0], point[1]) for point in entity.get_points()]
         is_closed = entity.closed
-        
-        # 색상, 두께, 선 종류
-        color = getattr(entity.dxf, 'color', None)
         lineweight = getattr(entity.dxf, 'const_width', None)
-        linetype = getattr(entity.dxf, 'linetype', None)
-        
-        polyline = PolylineEntity(
-            handle=entity.dxf.handle,
-            layer=entity.dxf.layer,
-            vertices=vertices,
-            is_closed=is_closed,
-            entity_type='LWPOLYLINE',
-            color=color,
-            lineweight=lineweight,
-            linetype=linetype
-        )
-        polyline.id = f"PL{idx:04d}"
-        polylines.append(polyline)
-        idx += 1
     
-    return polylines
+    return PolylineEntity(
+        handle=entity.dxf.handle,
+        layer=_intern(entity.dxf.layer),
+        vertices=vertices,
+        is_closed=is_closed,
+        entity_type=entity_type,
+        color=getattr(entity.dxf, 'color', None),
+        lineweight=lineweight,
+        linetype=_intern(getattr(entity.dxf, 'linetype', None))
+    )
 
 
 # ============================================================================
 # 화살표 탐지 (Arrow Detection)
 # ============================================================================
 
-def check_symmetrical_lines(shaft_line, meeting_line_indices, lines, line_lengths, 
-                           used_barbs, arrow_config):
+def arrow_pattern_batch(shaft_idx, barb1_idx, barb2_idx, line_array, arrow_config):
     """
-    주축선의 한 끝점에서 만나는 선분들 중 대칭선 조건을 만족하는 쌍 찾기
+    대칭선 후보 쌍 전체에 대해 대칭선 조건을 한 번에 검사 (NumPy 벡터 연산)
     
     Args:
-        shaft_line: 주축선
-        meeting_line_indices: 만나는 선분들의 인덱스 리스트 [(line_idx, 'start'|'end'), ...]
-        lines: 전체 선분 리스트
-        line_lengths: 전체 선분 길이 리스트
-        used_barbs: 이미 대칭선으로 사용된 선분 인덱스 집합 (set)
+        shaft_idx: 주축선 인덱스 배열 (P,)
+        barb1_idx, barb2_idx: 대칭선 후보 쌍의 인덱스 배열 (P,)
+        line_array: 전체 선분 배열 (LineArray)
         arrow_config: 화살표 설정
     
     Returns:
-        tuple: (barb1_idx, barb2_idx) 또는 None
+        np.ndarray: 대칭선 조건을 만족하는 쌍이면 True인 bool 배열 (P,)
     """
     barb_length_diff_max = arrow_config['barb_length_diff_max']
     arrow_angle_max = arrow_config['arrow_angle_max']
     barb_angle_diff_max = arrow_config['barb_angle_diff_max']
     
-    # 2개 이상이어야 대칭선 검사 가능
-    if len(meeting_line_indices) < 2:
-        return None
+    line_lengths = line_array.lengths
+    valid = np.zeros(len(shaft_idx), dtype=bool)
     
-    # 모든 2개 조합 검사
-    for idx1 in range(len(meeting_line_indices)):
-        for idx2 in range(idx1 + 1, len(meeting_line_indices)):
-            line_j_idx, _ = meeting_line_indices[idx1]
-            line_k_idx, _ = meeting_line_indices[idx2]
-            
-            # 이미 대칭선으로 사용된 선분은 제외
-            if line_j_idx in used_barbs or line_k_idx in used_barbs:
-                continue
-            
-            line_j = lines[line_j_idx]
-            line_k = lines[line_k_idx]
-            
-            # 조건 1: 두 대칭선의 길이 차이
-            barb_j_length = line_lengths[line_j_idx]
-            barb_k_length = line_lengths[line_k_idx]
-            length_diff = abs(barb_j_length - barb_k_length)
-            
-            if length_diff > barb_length_diff_max:
-                continue
-            
-            # 조건 2: 주축선과의 각도
-            angle_j = angle_between(shaft_line, line_j)
-            angle_k = angle_between(shaft_line, line_k)
-            
-            if angle_j > arrow_angle_max or angle_k > arrow_angle_max:
-                continue
-            
-            # 조건 3: 두 대칭선의 각도 차이
-            angle_diff = abs(angle_j - angle_k)
-            
-            if angle_diff > barb_angle_diff_max:
-                continue
-            
-            # 대칭선 조건 만족!
-            return (line_j_idx, line_k_idx)
+    # 잘 걸러내는 조건부터 검사하고, 통과한 쌍만 남겨서 다음 조건을 계산 (배열 단위 조기 종료)
+    # (test-003 기준: 각도 조건 통과 약 11%, 길이 조건 통과 약 96%)
+    # 조건 1: 주축선과의 각도 - angle <= max ⇔ cos(angle) >= cos(max)
+    cos_angle_min = math.cos(math.radians(arrow_angle_max))
+    cos_1 = pair_cos(line_array, shaft_idx, barb1_idx)
+    survivors = np.nonzero(cos_1 >= cos_angle_min)[0]
+    cos_1 = cos_1[survivors]
+    
+    cos_2 = pair_cos(line_array, shaft_idx[survivors], barb2_idx[survivors])
+    keep = cos_2 >= cos_angle_min
+    survivors, cos_1, cos_2 = survivors[keep], cos_1[keep], cos_2[keep]
+    
+    # 조건 2: 두 대칭선의 길이 차이
+    keep = np.abs(line_lengths[barb1_idx[survivors]] - line_lengths[barb2_idx[survivors]]) <= barb_length_diff_max
+    survivors, cos_1, cos_2 = survivors[keep], cos_1[keep], cos_2[keep]
+    
+    # 조건 3: 두 대칭선의 각도 차이 - 선분별 방향각(atan2) 차이로 계산 (acos 불필요)
+    shaft_angles = line_array.angles[shaft_idx[survivors]]
+    angle_1 = fold_angle_diff(shaft_angles - line_array.angles[barb1_idx[survivors]])
+    angle_2 = fold_angle_diff(shaft_angles - line_array.angles[barb2_idx[survivors]])
+    # 길이가 0인 대칭선은 방향이 없으므로 pair_cos와 같이 0°로 취급
+    angle_1[line_lengths[barb1_idx[survivors]] == 0] = 0.0
+    angle_2[line_lengths[barb2_idx[survivors]] == 0] = 0.0
+    angle_diff = np.abs(np.degrees(angle_1) - np.degrees(angle_2))
+    valid[survivors[angle_diff <= barb_angle_diff_max]] = True
+    
+    return valid
+
+
+def check_symmetrical_lines(valid_pairs, used_barbs):
+    """
+    주축선의 한 끝점에서 만나는 선분 쌍 중 아직 사용되지 않은 첫 번째 대칭선 쌍 찾기
+    
+    Args:
+        valid_pairs: 대칭선 조건(arrow_pattern_batch)을 만족한 쌍만 조합 순서대로 모은 리스트
+                     [(barb1_idx, barb2_idx), ...]
+        used_barbs: 대칭선 사용 여부 플래그 (bytearray, 선분 인덱스 → 0/1)
+    
+    Returns:
+        tuple: (barb1_idx, barb2_idx) 또는 None
+    """
+    for line_j_idx, line_k_idx in valid_pairs:
+        # 이미 대칭선으로 사용된 선분은 제외
+        if used_barbs[line_j_idx] or used_barbs[line_k_idx]:
+            continue
+        
+        # 대칭선 조건 만족!
+        return (line_j_idx, line_k_idx)
     
     return None
 
 
-def detect_arrows_in_drawing(lines, config):
+def find_candidate_pairs(line_range, line_array, cell_size):
+    """
+    line_range의 각 선분 끝점 주변(3×3 셀)에 끝점이 있는 더 짧은 선분 쌍 찾기
+    (cell_size 이내의 끝점은 모두 포함됨 - 정확한 거리 검사는 호출하는 쪽에서 수행)
+    
+    Args:
+        line_range: 검사할 선분 인덱스 범위 (연속 구간)
+        line_array: 전체 선분 배열 (LineArray)
+        cell_size: 격자 셀 크기 (검색 반경 이상이어야 함)
+    
+    Returns:
+        tuple: (i_idx, j_idx) - length[j] < length[i]인 중복 없는 선분 쌍 인덱스 배열
+                                (i 오름차순, 같은 i 안에서 j 오름차순)
+    """
+    n = len(line_array)
+    
+    # 끝점 2N개 (u < N: 시작점, u >= N: 끝점) 중 검사할 선분의 두 끝점으로 주변 끝점 검색
+    endpoints = np.concatenate((line_array.starts, line_array.ends))
+    owners = np.arange(line_range.start, line_range.stop)
+    query = np.concatenate((owners, owners + n))
+    q_idx, u_idx = PointGrid(endpoints, cell_size).neighbors(endpoints[query])
+    i_idx = query[q_idx] % n
+    j_idx = u_idx % n
+    
+    # 길이 조건을 먼저 적용해서 중복 제거(정렬) 대상을 줄임 - 대칭선은 주축선보다 짧아야 함
+    shorter = line_array.lengths[j_idx] < line_array.lengths[i_idx]
+    i_idx, j_idx = i_idx[shorter], j_idx[shorter]
+    
+    # 같은 선분 쌍은 한 번만 (i, j 순으로 정렬됨)
+    pair_keys = np.unique(i_idx * n + j_idx)
+    return pair_keys // n, pair_keys % n
+
+
+def find_meeting_lines(line_range, line_array, cell_size, tip_tolerance_sq, parallel_angle=5.0):
+    """
+    지정한 선분들의 시작점/끝점에서 만나는 더 짧은 선분 찾기 (화살표 탐지 2차 프로세스)
+    
+    Args:
+        line_range: 검사할 선분 인덱스 범위 (연속 구간)
+        line_array: 전체 선분 배열 (LineArray)
+        cell_size: 격자 셀 크기
+        tip_tolerance_sq: 끝점이 만나는 허용 오차 (제곱)
+        parallel_angle: 평행 판정 각도 임계값 (도, are_lines_parallel 기본값과 동일)
+    
+    Returns:
+        tuple: (endpoint_keys, meet_idx, parallel_skipped)
+            - endpoint_keys: 만남이 발생한 line_i 끝점 키 배열 (i*2 + 0=시작점/1=끝점)
+            - meet_idx: 그 끝점에서 만나는 선분 j 인덱스 배열 (i 오름차순, 같은 i 안에서 j 오름차순)
+            - parallel_skipped: 평행선으로 제외된 조합 수
+    """
+    if len(line_range) == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, 0
+    
+    line_starts, line_ends = line_array.starts, line_array.ends
+    line_lengths = line_array.lengths
+    
+    # 주변 셀에 끝점이 있는 선분 중 line_i보다 짧은 선분만 후보로 검사
+    i_idx, j_idx = find_candidate_pairs(line_range, line_array, cell_size)
+    
+    # 평행선 체크 - 평행이면 화살표 불가능 (are_lines_parallel과 같은 외적 비교)
+    dirs = line_array.dirs
+    cross = dirs[i_idx, 0] * dirs[j_idx, 1] - dirs[i_idx, 1] * dirs[j_idx, 0]
+    mag = line_lengths[i_idx] * line_lengths[j_idx]
+    parallel = (np.abs(cross) < _sin_of_degrees(parallel_angle) * mag) | (mag == 0)
+    parallel_skipped = int(np.count_nonzero(parallel))
+    i_idx, j_idx = i_idx[~parallel], j_idx[~parallel]
+    
+    # 4가지 점 조합의 거리(제곱) - 허용 오차도 제곱으로 비교하므로 sqrt 불필요
+    # 끝점 좌표는 쌍마다 한 번씩만 꺼내 두고 4가지 조합에 재사용
+    # 열 순서: i시작-j시작, i시작-j끝, i끝-j시작, i끝-j끝
+    i_start, i_end = line_starts[i_idx], line_ends[i_idx]
+    j_start, j_end = line_starts[j_idx], line_ends[j_idx]
+    dist_sq = np.empty((len(i_idx), 4), dtype=np.float64)
+    for col, (p_i, p_j) in enumerate(((i_start, j_start), (i_start, j_end),
+                                      (i_end, j_start), (i_end, j_end))):
+        diff = p_i - p_j
+        dist_sq[:, col] = diff[:, 0]**2 + diff[:, 1]**2
+    
+    # 가장 가까운 조합 (같으면 앞선 조합 우선) 이 허용 오차 이내일 때만 line_i의 해당 끝점에 기록
+    closest = np.argmin(dist_sq, axis=1)
+    hit = dist_sq[np.arange(len(closest)), closest] <= tip_tolerance_sq
+    endpoint_keys = i_idx[hit] * 2 + (closest[hit] >= 2)  # 조합 0,1 → 시작점 / 2,3 → 끝점
+    
+    return endpoint_keys, j_idx[hit], parallel_skipped
+
+
+# 병렬 검색용 프로세스별 공유 데이터 (initializer에서 한 번만 전달받음)
+_meeting_worker_args = None
+
+
+def _init_meeting_worker(*args):
+    global _meeting_worker_args
+    _meeting_worker_args = args
+
+
+def _find_meeting_lines_worker(line_range):
+    return find_meeting_lines(line_range, *_meeting_worker_args)
+
+
+def detect_arrows_in_drawing(lines, line_array, config):
     """
     도면에서 모든 화살표 탐지 (최적화된 단계별 알고리즘)
     
@@ -586,14 +810,19 @@ def detect_arrows_in_drawing(lines, config):
     - 3개 선분의 시작점 또는 끝점이 한 점에서 만남
     - 대칭선은 주축선보다 짧음
     - 두 대칭선의 길이가 비슷함
+    
+    Args:
+        lines: 전체 선분 리스트
+        line_array: parse_modelspace()가 만든 선분 배열 (LineArray)
+        config: 설정
     """
     
     arrows = []
     arrow_config = config['ARROW_DETECTION']
     tip_tolerance = arrow_config['tip_point_tolerance']
     
-    # 이미 대칭선으로 사용된 선분 인덱스 저장
-    used_barbs = set()
+    # 이미 대칭선으로 사용된 선분 표시 (선분 인덱스별 0/1 플래그 - 해시 없이 바로 조회)
+    used_barbs = bytearray(len(lines))
     
     print(f"\n화살표 탐지 중...")
     print(f"  전체 선분: {len(lines)}개")
@@ -602,9 +831,7 @@ def detect_arrows_in_drawing(lines, config):
     # 1차 프로세스: 모든 직선의 길이 계산
     # ========================================================================
     print(f"\n[1차 프로세스] 선분 길이 계산 중...")
-    line_lengths = []
-    for line in lines:
-        line_lengths.append(length(line))
+    line_lengths = line_array.lengths  # 파싱 시 Line 생성과 함께 채운 길이 배열 재사용
     print(f"✓ 완료: {len(line_lengths)}개 선분 길이 계산")
     
     # ========================================================================
@@ -612,60 +839,49 @@ def detect_arrows_in_drawing(lines, config):
     # ========================================================================
     print(f"\n[2차 프로세스] 만나는 선분 검색 중...")
     
-    # 각 선분의 시작점/끝점에서 만나는 선분 정보 저장
-    meeting_lines = []
-    for i in range(len(lines)):
-        meeting_lines.append({'start': [], 'end': []})
+    tip_tolerance_sq = tip_tolerance * tip_tolerance
     
-    parallel_skipped = 0  # 평행선 제외 카운트
+    # 끝점 격자 - 셀 크기가 허용 오차 이상이면 주변 3×3 셀만 보면 됨
+    cell_size = tip_tolerance if tip_tolerance > 0 else 1.0
     
-    for i, line_i in enumerate(lines):
-        if (i + 1) % 100 == 0:
-            print(f"  진행: {i+1}/{len(lines)} 선분 처리 중...")
-        
-        line_i_length = line_lengths[i]
+    search_args = (line_array, cell_size, tip_tolerance_sq)
+    workers = arrow_config.get('parallel_workers', 1) or os.cpu_count() or 1
+    
+    if workers <= 1 or len(lines) < 2 * workers:
+        endpoint_keys, meet_idx, parallel_skipped = find_meeting_lines(range(len(lines)), *search_args)
+    else:
+        # 선분별 검색은 서로 독립적이므로 구간으로 나눠 여러 프로세스에서 처리한 뒤 순서대로 이어 붙임
+        chunk_size = -(-len(lines) // workers)
+        chunks = [range(start, min(start + chunk_size, len(lines)))
+                  for start in range(0, len(lines), chunk_size)]
+        print(f"  병렬 처리: {len(chunks)}개 프로세스")
         
-        for j, line_j in enumerate(lines):
-            if i == j:
-                continue
-            
-            line_j_length = line_lengths[j]
-            
-            # line_j가 line_i보다 짧은 경우만 검사
-            if line_j_length >= line_i_length:
-                continue
-            
-            # 평행선 체크 - 평행이면 화살표 불가능
-            if are_lines_parallel(line_i, line_j):
-                parallel_skipped += 1
-                continue
-            
-            # 4가지 점 조합의 거리 계산
-            distances = [
-                (distance(line_i.start_point, line_j.start_point), 'i_start', 'j_start'),
-                (distance(line_i.start_point, line_j.end_point), 'i_start', 'j_end'),
-                (distance(line_i.end_point, line_j.start_point), 'i_end', 'j_start'),
-                (distance(line_i.end_point, line_j.end_point), 'i_end', 'j_end')
-            ]
-            
-            # 가장 가까운 거리 찾기
-            min_dist, i_point, j_point = min(distances, key=lambda x: x[0])
-            
-            # 가장 가까운 거리가 허용 오차 이내일 때만 저장
-            if min_dist <= tip_tolerance:
-                # line_i의 어느 점인지에 따라 저장
-                if i_point == 'i_start':
-                    meeting_lines[i]['start'].append((j, j_point.split('_')[1]))  # 'start' or 'end'
-                else:  # i_point == 'i_end'
-                    meeting_lines[i]['end'].append((j, j_point.split('_')[1]))  # 'start' or 'end'
+        key_parts, meet_parts = [], []
+        parallel_skipped = 0
+        with ProcessPoolExecutor(max_workers=len(chunks), initializer=_init_meeting_worker,
+                                 initargs=search_args) as executor:
+            for chunk_keys, chunk_meets, chunk_skipped in executor.map(_find_meeting_lines_worker, chunks):
+                key_parts.append(chunk_keys)
+                meet_parts.append(chunk_meets)
+                parallel_skipped += chunk_skipped
+        endpoint_keys = np.concatenate(key_parts)
+        meet_idx = np.concatenate(meet_parts)
+    
+    # 끝점별로 묶기 (선분 순서, 시작점 → 끝점 / 같은 끝점 안에서는 j 오름차순 유지)
+    order = np.argsort(endpoint_keys, kind='stable')
+    meet_idx = meet_idx[order]
+    group_keys, group_first, group_sizes = np.unique(
+        endpoint_keys[order], return_index=True, return_counts=True
+    )
     
     # 2차 프로세스 결과 출력
-    count_start_2 = sum(1 for ml in meeting_lines if len(ml['start']) >= 2)
-    count_end_2 = sum(1 for ml in meeting_lines if len(ml['end']) >= 2)
+    multi = group_sizes >= 2
+    count_start_2 = int(np.count_nonzero(multi & (group_keys % 2 == 0)))
+    count_end_2 = int(np.count_nonzero(multi & (group_keys % 2 == 1)))
     total_endpoints_with_2_meetings = count_start_2 + count_end_2
     
     print(f"✓ 완료")
-    print(f"  평행선 제외: {parallel_skipped}개 조합")
+    print(f"  평행선 제외: {parallel_skipped}개 조합 (끝점이 만나는 후보 기준)")
     print(f"  시작점에서 2개 이상 만나는 선분: {count_start_2}개")
     print(f"  끝점에서 2개 이상 만나는 선분: {count_end_2}개")
     print(f"  총 2개 이상 만나는 끝점 수: {total_endpoints_with_2_meetings}개")
@@ -675,74 +891,77 @@ def detect_arrows_in_drawing(lines, config):
     # ========================================================================
     print(f"\n[3차 프로세스] 화살표 패턴 검증 중...")
     
+    # 2개 이상 만나는 끝점마다 가능한 모든 대칭선 후보 쌍을 모아서 한 번에 검사
+    # (2차 결과 배열에서 바로 쌍을 만듦 - 선분별 중간 dict/list 없음)
+    endpoint_groups = []  # (line_idx, 'start'|'end')
+    group_idx, shaft_idx, barb1_idx, barb2_idx = [], [], [], []
+    meet_list = meet_idx.tolist()
+    
+    for key, first, size in zip(group_keys[multi].tolist(), group_first[multi].tolist(),
+                                group_sizes[multi].tolist()):
+        i = key // 2
+        g = len(endpoint_groups)
+        endpoint_groups.append((i, 'end' if key % 2 else 'start'))
+        
+        meetings = meet_list[first:first + size]
+        for a in range(size):
+            for b in range(a + 1, size):
+                group_idx.append(g)
+                shaft_idx.append(i)
+                barb1_idx.append(meetings[a])
+                barb2_idx.append(meetings[b])
+    
+    barb1_idx = np.array(barb1_idx, dtype=np.intp)
+    barb2_idx = np.array(barb2_idx, dtype=np.intp)
+    pair_valid = arrow_pattern_batch(
+        np.array(shaft_idx, dtype=np.intp), barb1_idx, barb2_idx, line_array, arrow_config
+    )
+    
+    # 조건을 만족한 쌍만 끝점별로 모아 둠 (순차 선택 단계에서는 이 쌍들만 확인)
+    valid_pairs_by_group = defaultdict(list)
+    for g, barb1, barb2 in zip(np.array(group_idx, dtype=np.intp)[pair_valid].tolist(),
+                               barb1_idx[pair_valid].tolist(), barb2_idx[pair_valid].tolist()):
+        valid_pairs_by_group[g].append((barb1, barb2))
+    
     arrow_count = 0
     
-    for i, line_i in enumerate(lines):
-        if (i + 1) % 100 == 0:
-            print(f"  진행: {i+1}/{len(lines)} 선분 검증 중... (발견: {arrow_count}개)")
+    # 대칭선 중복 사용을 막기 위해 선분 순서대로 검사 (시작점 → 끝점)
+    for g, (i, side) in enumerate(endpoint_groups):
+        if (g + 1) % 100 == 0:
+            print(f"  진행: {g+1}/{len(endpoint_groups)} 끝점 검증 중... (발견: {arrow_count}개)")
         
-        # 시작점 검사
-        if len(meeting_lines[i]['start']) >= 2:
-            result = check_symmetrical_lines(
-                shaft_line=line_i,
-                meeting_line_indices=meeting_lines[i]['start'],
-                lines=lines,
-                line_lengths=line_lengths,
-                used_barbs=used_barbs,
-                arrow_config=arrow_config
-            )
-            
-            if result:
-                barb1_idx, barb2_idx = result
-                
-                # 화살표 생성
-                arrow = Arrow(
-                    shaft=line_i,
-                    left_barb=lines[barb1_idx],
-                    right_barb=lines[barb2_idx],
-                    tip_point=line_i.start_point,
-                    direction='start'
-                )
-                arrows.append(arrow)
-                arrow_count += 1
-                
-                # 대칭선으로 사용됨 표시
-                used_barbs.add(barb1_idx)
-                used_barbs.add(barb2_idx)
+        valid_pairs = valid_pairs_by_group.get(g)
+        if not valid_pairs:
+            continue
+        
+        result = check_symmetrical_lines(
+            valid_pairs=valid_pairs,
+            used_barbs=used_barbs
+        )
         
-        # 끝점 검사
-        if len(meeting_lines[i]['end']) >= 2:
-            result = check_symmetrical_lines(
-                shaft_line=line_i,
-                meeting_line_indices=meeting_lines[i]['end'],
-                lines=lines,
-                line_lengths=line_lengths,
-                used_barbs=used_barbs,
-                arrow_config=arrow_config
+        if result:
+            barb1, barb2 = result
+            line_i = lines[i]
+            
+            # 화살표 생성
+            arrow = Arrow(
+                shaft=line_i,
+                left_barb=lines[barb1],
+                right_barb=lines[barb2],
+                tip_point=line_i.start_point if side == 'start' else line_i.end_point,
+                direction=side
             )
+            arrows.append(arrow)
+            arrow_count += 1
             
-            if result:
-                barb1_idx, barb2_idx = result
-                
-                # 화살표 생성
-                arrow = Arrow(
-                    shaft=line_i,
-                    left_barb=lines[barb1_idx],
-                    right_barb=lines[barb2_idx],
-                    tip_point=line_i.end_point,
-                    direction='end'
-                )
-                arrows.append(arrow)
-                arrow_count += 1
-                
-                # 대칭선으로 사용됨 표시
-                used_barbs.add(barb1_idx)
-                used_barbs.add(barb2_idx)
+            # 대칭선으로 사용됨 표시
+            used_barbs[barb1] = 1
+            used_barbs[barb2] = 1
     
     # 3차 프로세스 결과 출력
     print(f"✓ 완료")
     print(f"  화살표로 판정된 선분: {arrow_count}개")
-    print(f"  대칭선으로 사용된 선분: {len(used_barbs)}개")
+    print(f"  대칭선으로 사용된 선분: {used_barbs.count(1)}개")
     
     # ID 부여
     for i, arrow in enumerate(arrows, 1):
@@ -758,13 +977,23 @@ def detect_arrows_in_drawing(lines, config):
 # ============================================================================
 
 def create_arrow_leaders(arrows):
-    """화살표로부터 지시화살표선 생성"""
+    """
+    화살표로부터 지시화살표선 생성
+    
+    Returns:
+        tuple: (arrow_leaders, leader_xy)
+            - arrow_leaders: 지시화살표선 리스트
+            - leader_xy: 지시 위치 좌표 배열 (K×2, float64) - arrow_leaders와 같은 순서
+    """
     
     arrow_leaders = []
+    leader_xy = np.empty((len(arrows), 2), dtype=np.float64)
     
-    for arrow in arrows:
+    for i, arrow in enumerate(arrows):
         # 지시 위치 결정
         leader_pos = get_leader_position(arrow.shaft, arrow.direction)
+        leader_xy[i, 0] = leader_pos.x
+        leader_xy[i, 1] = leader_pos.y
         
         arrow_leader = ArrowLeader(
             arrow=arrow,
@@ -778,32 +1007,49 @@ def create_arrow_leaders(arrows):
     for i, leader in enumerate(arrow_leaders, 1):
         leader.id = f"A{i:03d}"
     
-    return arrow_leaders
+    return arrow_leaders, leader_xy
 
 
 # ============================================================================
 # 텍스트 매칭 (Text Matching)
 # ============================================================================
 
-def match_texts_to_arrows(arrow_leaders, texts, config):
-    """지시화살표선과 텍스트 매칭"""
+def match_texts_to_arrows(arrow_leaders, leader_xy, texts, text_xy, config):
+    """
+    지시화살표선과 텍스트 매칭
+    
+    Args:
+        arrow_leaders: 지시화살표선 리스트
+        leader_xy: create_arrow_leaders()가 만든 지시 위치 좌표 배열 (K×2)
+        texts: 텍스트 리스트
+        text_xy: parse_modelspace()가 만든 텍스트 위치 좌표 배열 (M×2)
+        config: 설정
+    """
     
     max_distance = config['LEADER_ARROW_MATCHING']['max_distance']
     
     print(f"\n텍스트 매칭 중...")
     
-    for leader in arrow_leaders:
-        min_dist = float('inf')
-        closest_text = None
+    if texts and arrow_leaders:
+        # 지시 위치 주변 격자 셀의 텍스트만 후보로 검사 (셀 크기 = 최대 거리)
+        max_distance_sq = max_distance * max_distance
+        cell_size = max_distance if max_distance > 0 else 1.0
+        leader_idx, text_idx = PointGrid(text_xy, cell_size).neighbors(leader_xy)
         
-        for text in texts:
-            dist = distance(leader.leader_position, text.position)
-            
-            if dist < max_distance and dist < min_dist:
-                min_dist = dist
-                closest_text = text
+        dist_sq = ((text_xy[text_idx, 0] - leader_xy[leader_idx, 0]) ** 2
+                   + (text_xy[text_idx, 1] - leader_xy[leader_idx, 1]) ** 2)
+        near = dist_sq < max_distance_sq
+        leader_idx, text_idx, dist_sq = leader_idx[near], text_idx[near], dist_sq[near]
+        
+        # 지시 위치별 가장 가까운 텍스트 (거리가 같으면 먼저 나온 텍스트)
+        order = np.lexsort((text_idx, dist_sq, leader_idx))
+        leader_idx, text_idx = leader_idx[order], text_idx[order]
+        first = np.ones(len(leader_idx), dtype=bool)
+        first[1:] = leader_idx[1:] != leader_idx[:-1]
         
-        if closest_text:
+        for k, closest_idx in zip(leader_idx[first].tolist(), text_idx[first].tolist()):
+            leader = arrow_leaders[k]
+            closest_text = texts[closest_idx]
             leader.matched_text = closest_text
             closest_text.matched_arrows.append(leader)
     
@@ -817,8 +1063,16 @@ def match_texts_to_arrows(arrow_leaders, texts, config):
 # 지시경계선 탐지 (Boundary Line Detection)
 # ============================================================================
 
-def detect_boundary_lines(arrow_leaders, lines, config):
-    """지시경계선 탐지"""
+def detect_boundary_lines(arrow_leaders, lines, line_array, config):
+    """
+    지시경계선 탐지
+    
+    Args:
+        arrow_leaders: 지시화살표선 리스트
+        lines: 전체 선분 리스트
+        line_array: parse_modelspace()가 만든 선분 배열 (LineArray)
+        config: 설정
+    """
     
     boundary_config = config['LEADER_BOUNDARY_MATCHING']
     max_dist = boundary_config['max_distance_to_arrow']
@@ -827,38 +1081,55 @@ def detect_boundary_lines(arrow_leaders, lines, config):
     
     print(f"\n지시경계선 탐지 중...")
     
-    # 화살표가 사용한 선분들 제외
-    arrow_lines = set()
+    # 화살표가 사용한 선분들 제외 (좌표 배열 인덱스 기준 마스크)
+    arrow_line_mask = np.zeros(len(lines), dtype=bool)
     for leader in arrow_leaders:
-        arrow_lines.add(leader.arrow.shaft)
-        arrow_lines.add(leader.arrow.left_barb)
-        arrow_lines.add(leader.arrow.right_barb)
+        arrow_line_mask[leader.arrow.shaft.idx] = True
+        arrow_line_mask[leader.arrow.left_barb.idx] = True
+        arrow_line_mask[leader.arrow.right_barb.idx] = True
     
     boundary_lines = []
-    
-    for leader in arrow_leaders:
-        arrow_tip = leader.arrow.tip_point
-        arrow_shaft = leader.arrow.shaft
-        
-        for line in lines:
-            # 화살표 구성 선분 제외
-            if line in arrow_lines:
-                continue
-            
-            # 조건 1: 화살표 위치와의 거리
-            dist_to_start = distance(arrow_tip, line.start_point)
-            dist_to_end = distance(arrow_tip, line.end_point)
-            min_dist_to_line = min(dist_to_start, dist_to_end)
-            
-            if min_dist_to_line > max_dist:
-                continue
-            
-            # 조건 2: 화살표 직선과의 각도 (직각)
-            angle = angle_between(arrow_shaft, line)
-            
-            if angle_min <= angle <= angle_max:
-                leader.matched_boundaries.append(line)
-                boundary_lines.append(line)
+    if not arrow_leaders or len(line_array) == 0:
+        print(f"✓ 지시경계선 탐지 완료: 0개 발견")
+        return boundary_lines
+    
+    max_dist_sq = max_dist * max_dist
+    cos_perp_low = math.cos(math.radians(angle_max))
+    cos_perp_high = math.cos(math.radians(angle_min))
+    
+    # 화살표 끝점 주변 격자 셀에 끝점이 있는 (지시화살표선, 선분) 후보 쌍 (셀 크기 = 최대 거리)
+    n = len(line_array)
+    tip_xy = np.array([(leader.arrow.tip_point.x, leader.arrow.tip_point.y) for leader in arrow_leaders],
+                      dtype=np.float64)
+    shaft_idx = np.array([leader.arrow.shaft.idx for leader in arrow_leaders], dtype=np.intp)
+    cell_size = max_dist if max_dist > 0 else 1.0
+    leader_idx, u_idx = PointGrid(
+        np.concatenate((line_array.starts, line_array.ends)), cell_size
+    ).neighbors(tip_xy)
+    
+    # 같은 쌍은 한 번만 (지시화살표선 → 선분 인덱스 순), 화살표 구성 선분은 제외
+    pair_keys = np.unique(leader_idx * n + u_idx % n)
+    leader_idx, line_idx = pair_keys // n, pair_keys % n
+    keep = ~arrow_line_mask[line_idx]
+    leader_idx, line_idx = leader_idx[keep], line_idx[keep]
+    
+    # 조건 1: 화살표 위치와의 거리 (시작점/끝점 중 가까운 쪽, 제곱 거리)
+    tip_x, tip_y = tip_xy[leader_idx, 0], tip_xy[leader_idx, 1]
+    starts, ends = line_array.starts[line_idx], line_array.ends[line_idx]
+    dist_to_start = (starts[:, 0] - tip_x) ** 2 + (starts[:, 1] - tip_y) ** 2
+    dist_to_end = (ends[:, 0] - tip_x) ** 2 + (ends[:, 1] - tip_y) ** 2
+    near = np.minimum(dist_to_start, dist_to_end) <= max_dist_sq
+    
+    # 조건 2: 화살표 직선과의 각도 (직각)
+    #   angle_min <= angle <= angle_max ⇔ cos(angle_max) <= cos(angle) <= cos(angle_min)
+    cos_values = cos_angles_between(line_array.dirs[shaft_idx[leader_idx]], line_array.dirs[line_idx])
+    perpendicular = (cos_values >= cos_perp_low) & (cos_values <= cos_perp_high)
+    
+    matched = near & perpendicular
+    for k, idx in zip(leader_idx[matched].tolist(), line_idx[matched].tolist()):
+        line = lines[idx]
+        arrow_leaders[k].matched_boundaries.append(line)
+        boundary_lines.append(line)
     
     print(f"✓ 지시경계선 탐지 완료: {len(boundary_lines)}개 발견")
     
@@ -869,191 +1140,252 @@ def detect_boundary_lines(arrow_leaders, lines, config):
 # 보고서 생성 (Report Generation)
 # ============================================================================
 
+# 보고서 구분선/제목 (호출마다 다시 만들지 않도록 미리 생성)
+_EQ80 = "=" * 80 + "\n"
+_DASH80 = "-" * 80 + "\n"
+_HDR_TITLE = " " * 25 + "DXF 파일 분석 보고서\n"
+_FTR_TITLE = " " * 30 + "분석 보고서 끝\n"
+
+# 레이어/엔티티 요약 표의 행 템플릿 (레이어명 | 엔티티 수 | 주요 엔티티 유형)
+_LAYER_ROW = "%-20s | %10d | %s\n"
+_ENTITY_ROW = "%-20s | %10d\n"
+
+
+def _open_report(filename):
+    """보고서 출력 파일을 바이너리 모드로 열기 (.gz로 끝나면 gzip 압축 - 속도 우선으로 compresslevel=1)"""
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wb', compresslevel=1)
+    return open(filename, 'wb', buffering=REPORT_BUFFER_SIZE)
+
+
+def format_vertex_list(vertices, limit=20):
+    """
+    보고서용 꼭지점 목록 블록 (최대 limit개, 나머지는 개수만 표시)
+    
+    Returns:
+        str: "  꼭지점 목록   :" 줄부터 마지막 줄바꿈까지 포함한 문자열
+    """
+    rows = '\n'.join([f"    [{idx}] {vertex}" for idx, vertex in enumerate(vertices[:limit])])
+    block = f"  꼭지점 목록   :\n{rows}\n"
+    if len(vertices) > limit:
+        block += f"    ... 외 {len(vertices) - limit}개\n"
+    return block
+
+
 def generate_report(doc, layers, entities, texts, arrows, arrow_leaders, boundary_lines, 
                    leaders, polylines, filename):
     """분석 보고서 생성"""
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        # 헤더
-        f.write("=" * 80 + "\n")
-        f.write(" " * 25 + "DXF 파일 분석 보고서\n")
-        f.write("=" * 80 + "\n\n")
-        
-        # 1. 파일 정보
-        f.write("[1. 파일 정보]\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"파일명         : {INPUT_FILE}\n")
-        f.write(f"DXF 버전       : {doc.dxfversion}\n")
-        f.write(f"분석 일시      : {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"화살표 탐지    : {'활성화' if ON_DETECT_EX_LEADERS else '비활성화'}\n")
-        f.write("\n")
-        
-        # 2. 레이어 구조
-        f.write("[2. 레이어 구조]\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"{'레이어명':<20} | {'엔티티 수':>10} | 주요 엔티티 유형\n")
-        f.write("-" * 80 + "\n")
-        for layer_name, info in sorted(layers.items()):
-            entity_types = ', '.join(sorted(info['entity_types']))[:40]
-            f.write(f"{layer_name:<20} | {info['entity_count']:>10} | {entity_types}\n")
-        f.write(f"\n총 레이어 수: {len(layers)}개\n\n")
-        
-        # 3. 엔티티 분류 통계
-        f.write("[3. 엔티티 분류 통계]\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"{'엔티티 유형':<20} | {'총 개수':>10}\n")
-        f.write("-" * 80 + "\n")
-        for entity_type, entity_list in sorted(entities.items()):
-            f.write(f"{entity_type:<20} | {len(entity_list):>10}\n")
-        f.write("\n")
-
-        # 4. 화살표 탐지 결과
-        f.write("[4. 화살표 탐지 결과]\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"총 탐지된 화살표: {len(arrows)}개\n\n")
-
-        for arrow in arrows[:10]:  # 처음 10개만 표시
-            f.write(f"ID: {arrow.id}\n")
-            f.write(f"  주축선        : [{arrow.shaft.id}] {arrow.shaft.start_point} → {arrow.shaft.end_point}\n")
-            f.write(f"  왼쪽 화살촉 : [{arrow.left_barb.id}] {arrow.left_barb.start_point} → {arrow.left_barb.end_point}\n")
-            f.write(f"  오른쪽 화살촉: [{arrow.right_barb.id}] {arrow.right_barb.start_point} → {arrow.right_barb.end_point}\n")
-            f.write(f"  화살표 방향 : {arrow.direction}\n")
-            f.write("\n")
-        
-        if len(arrows) > 10:
-            f.write(f"... 외 {len(arrows) - 10}개\n\n")
-        
-        # 5. 치수/주석 상세 분석
-        f.write("[5. 치수/주석 상세 분석]\n")
-        f.write("-" * 80 + "\n")
-        
-        # 5.1 텍스트 엔티티
-        f.write(f"\n5.1 텍스트 엔티티 ({len(texts)}개)\n")
-        f.write("-" * 80 + "\n")
-        for text in texts[:20]:  # 처음 20개만
-            f.write(f"\nID: {text.handle}\n")
-            f.write(f"  유형   : {text.entity_type}\n")
-            f.write(f"  내용   : \"{text.content}\"\n")
-            f.write(f"  위치   : {text.position}\n")
-            f.write(f"  레이어 : {text.layer}\n")
-            if text.matched_arrows:
-                arrow_ids = ', '.join([a.id for a in text.matched_arrows])
-                f.write(f"  매칭된 화살표: {arrow_ids}\n")
-            else:
-                f.write(f"  매칭된 화살표: 없음 ⚠️\n")
-        
-        if len(texts) > 20:
-            f.write(f"\n... 외 {len(texts) - 20}개\n")
-
-        # 5.2 지시화살표선
-        f.write(f"\n\n5.2 지시화살표선 ({len(arrow_leaders)}개)\n")
-        f.write("-" * 80 + "\n")
-        for leader in arrow_leaders[:20]:  # 처음 20개만
-            f.write(f"\nID: {leader.id}\n")
-            f.write(f"  화살표 ID    : {leader.arrow.id}\n")
-            f.write(f"  지시 위치    : {leader.leader_position}\n")
-            f.write(f"  화살표 방향  : {leader.arrow.direction}\n")
-            if leader.matched_text:
-                f.write(f"  매칭된 텍스트: \"{leader.matched_text.content}\"\n")
-            else:
-                f.write(f"  매칭된 텍스트: 없음 ⚠️\n")
-            if leader.matched_boundaries:
-                f.write(f"  매칭된 경계선 : {len(leader.matched_boundaries)}개\n")
-        
-        if len(arrow_leaders) > 20:
-            f.write(f"\n... 외 {len(arrow_leaders) - 20}개\n")
-        
-        # 5.3 LEADER 엔티티
-        f.write(f"\n\n5.3 LEADER 엔티티 ({len(leaders)}개)\n")
-        f.write("-" * 80 + "\n")
-        for leader in leaders[:10]:  # 처음 10개만
-            f.write(f"\nID: {leader.id}\n")
-            f.write(f"  레이어        : {leader.layer}\n")
-            f.write(f"  화살촉 여부   : {leader.has_arrowhead}\n")
-            f.write(f"  색상          : {leader.color}\n")
-            f.write(f"  선 종류       : {leader.linetype}\n")
-            if leader.matched_text:
-                f.write(f"  매칭된 텍스트 : \"{leader.matched_text.content}\"\n")
-            else:
-                f.write(f"  매칭된 텍스트 : 없음\n")
-            
-            # 꼭지점 정보
-            f.write(f"  꼭지점 개수   : {len(leader.vertices)}개\n")
-            if leader.vertices:
-                f.write(f"  꼭지점 목록   :\n")
-                for idx, vertex in enumerate(leader.vertices[:20]):  # 최대 20개
-                    f.write(f"    [{idx}] {vertex}\n")
-                if len(leader.vertices) > 20:
-                    f.write(f"    ... 외 {len(leader.vertices) - 20}개\n")
-        
-        if len(leaders) > 10:
-            f.write(f"\n... 외 {len(leaders) - 10}개\n")
-        
-        # 5.4 POLYLINE 엔티티
-        f.write(f"\n\n5.4 POLYLINE/LWPOLYLINE 엔티티 ({len(polylines)}개)\n")
-        f.write("-" * 80 + "\n")
-        for polyline in polylines[:10]:  # 처음 10개만
-            f.write(f"\nID: {polyline.id}\n")
-            f.write(f"  레이어        : {polyline.layer}\n")
-            f.write(f"  닫힌 여부     : {polyline.is_closed}\n")
-            f.write(f"  유형          : {polyline.entity_type}\n")
-            f.write(f"  색상          : {polyline.color}\n")
-            f.write(f"  선 두께       : {polyline.lineweight}\n")
-            f.write(f"  선 종류       : {polyline.linetype}\n")
-            
-            # 꼭지점 정보
-            f.write(f"  꼭지점 개수   : {len(polyline.vertices)}개\n")
-            if polyline.vertices:
-                f.write(f"  꼭지점 목록   :\n")
-                for idx, vertex in enumerate(polyline.vertices[:20]):  # 최대 20개
-                    f.write(f"    [{idx}] {vertex}\n")
-                if len(polyline.vertices) > 20:
-                    f.write(f"    ... 외 {len(polyline.vertices) - 20}개\n")
+    # 여러 섹션에서 반복해서 쓰는 개수/분석 일시는 처음에 한 번만 계산
+    n_layers, n_texts, n_arrows, n_arrow_leaders = len(layers), len(texts), len(arrows), len(arrow_leaders)
+    n_boundary, n_leaders, n_polylines = len(boundary_lines), len(leaders), len(polylines)
+    analyzed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # 보고서 내용은 리스트에 모은 뒤 한 번에 기록
+    parts = []
+    w = parts.append
+    
+    # 헤더
+    w(_EQ80)
+    w(_HDR_TITLE)
+    w(_EQ80 + "\n")
+    
+    # 1. 파일 정보
+    w("[1. 파일 정보]\n")
+    w(_DASH80)
+    w(f"파일명         : {INPUT_FILE}\n")
+    w(f"DXF 버전       : {doc.dxfversion}\n")
+    w(f"분석 일시      : {analyzed_at}\n")
+    w(f"화살표 탐지    : {'활성화' if ON_DETECT_EX_LEADERS else '비활성화'}\n")
+    w("\n")
+    
+    # 2. 레이어 구조
+    w("[2. 레이어 구조]\n")
+    w(_DASH80)
+    w(f"{'레이어명':<20} | {'엔티티 수':>10} | 주요 엔티티 유형\n")
+    w(_DASH80)
+    for layer_name, info in layers.items():  # parse_modelspace()에서 레이어명 순으로 정렬됨
+        entity_types = ', '.join(sorted(info['entity_types']))[:40]
+        w(_LAYER_ROW % (layer_name, info['entity_count'], entity_types))
+    w(f"\n총 레이어 수: {n_layers}개\n\n")
+    
+    # 3. 엔티티 분류 통계
+    w("[3. 엔티티 분류 통계]\n")
+    w(_DASH80)
+    w(f"{'엔티티 유형':<20} | {'총 개수':>10}\n")
+    w(_DASH80)
+    for entity_type, entity_list in entities.items():
+        w(_ENTITY_ROW % (entity_type, len(entity_list)))
+    w("\n")
+
+    # 4. 화살표 탐지 결과
+    w("[4. 화살표 탐지 결과]\n")
+    w(_DASH80)
+    w(f"총 탐지된 화살표: {n_arrows}개\n\n")
+
+    # 엔티티별 항목은 조각 튜플을 한 번에 join해서 하나의 문자열로 추가
+    for arrow in arrows[:10]:  # 처음 10개만 표시
+        shaft, lb, rb = arrow.shaft, arrow.left_barb, arrow.right_barb
+        w(''.join((
+            f"ID: {arrow.id}\n",
+            f"  주축선        : [{shaft.id}] {shaft.start_point} → {shaft.end_point}\n",
+            f"  왼쪽 화살촉 : [{lb.id}] {lb.start_point} → {lb.end_point}\n",
+            f"  오른쪽 화살촉: [{rb.id}] {rb.start_point} → {rb.end_point}\n",
+            f"  화살표 방향 : {arrow.direction}\n",
+            "\n",
+        )))
+    
+    if n_arrows > 10:
+        w(f"... 외 {n_arrows - 10}개\n\n")
+    
+    # 5. 치수/주석 상세 분석
+    w("[5. 치수/주석 상세 분석]\n")
+    w(_DASH80)
+    
+    # 5.1 텍스트 엔티티
+    w(f"\n5.1 텍스트 엔티티 ({n_texts}개)\n")
+    w(_DASH80)
+    for text in texts[:20]:  # 처음 20개만
+        matched_arrows = text.matched_arrows
+        if matched_arrows:
+            arrow_ids = ', '.join([a.id for a in matched_arrows])
+            matched_line = f"  매칭된 화살표: {arrow_ids}\n"
+        else:
+            matched_line = f"  매칭된 화살표: 없음 ⚠️\n"
+        w(''.join((
+            f"\nID: {text.handle}\n",
+            f"  유형   : {text.entity_type}\n",
+            f"  내용   : \"{text.content}\"\n",
+            f"  위치   : {text.position}\n",
+            f"  레이어 : {text.layer}\n",
+            matched_line,
+        )))
+    
+    if n_texts > 20:
+        w(f"\n... 외 {n_texts - 20}개\n")
+
+    # 5.2 지시화살표선
+    w(f"\n\n5.2 지시화살표선 ({n_arrow_leaders}개)\n")
+    w(_DASH80)
+    for leader in arrow_leaders[:20]:  # 처음 20개만
+        arrow, matched_text, boundaries = leader.arrow, leader.matched_text, leader.matched_boundaries
+        w(''.join((
+            f"\nID: {leader.id}\n",
+            f"  화살표 ID    : {arrow.id}\n",
+            f"  지시 위치    : {leader.leader_position}\n",
+            f"  화살표 방향  : {arrow.direction}\n",
+            f"  매칭된 텍스트: \"{matched_text.content}\"\n" if matched_text
+            else f"  매칭된 텍스트: 없음 ⚠️\n",
+            f"  매칭된 경계선 : {len(boundaries)}개\n" if boundaries else "",
+        )))
+    
+    if n_arrow_leaders > 20:
+        w(f"\n... 외 {n_arrow_leaders - 20}개\n")
+    
+    # 5.3 LEADER 엔티티
+    w(f"\n\n5.3 LEADER 엔티티 ({n_leaders}개)\n")
+    w(_DASH80)
+    for leader in leaders[:10]:  # 처음 10개만
+        vertices, matched_text = leader.vertices, leader.matched_text
+        w(''.join((
+            f"\nID: {leader.id}\n",
+            f"  레이어        : {leader.layer}\n",
+            f"  화살촉 여부   : {leader.has_arrowhead}\n",
+            f"  색상          : {leader.color}\n",
+            f"  선 종류       : {leader.linetype}\n",
+            f"  매칭된 텍스트 : \"{matched_text.content}\"\n" if matched_text
+            else f"  매칭된 텍스트 : 없음\n",
+            f"  꼭지점 개수   : {len(vertices)}개\n",
+        )))
         
-        if len(polylines) > 10:
-            f.write(f"\n... 외 {len(polylines) - 10}개\n")
+        # 꼭지점 정보
+        if vertices:
+            w(format_vertex_list(vertices))
+    
+    if n_leaders > 10:
+        w(f"\n... 외 {n_leaders - 10}개\n")
+    
+    # 5.4 POLYLINE 엔티티
+    w(f"\n\n5.4 POLYLINE/LWPOLYLINE 엔티티 ({n_polylines}개)\n")
+    w(_DASH80)
+    for polyline in polylines[:10]:  # 처음 10개만
+        vertices = polyline.vertices
+        w(''.join((
+            f"\nID: {polyline.id}\n",
+            f"  레이어        : {polyline.layer}\n",
+            f"  닫힌 여부     : {polyline.is_closed}\n",
+            f"  유형          : {polyline.entity_type}\n",
+            f"  색상          : {polyline.color}\n",
+            f"  선 두께       : {polyline.lineweight}\n",
+            f"  선 종류       : {polyline.linetype}\n",
+            f"  꼭지점 개수   : {len(vertices)}개\n",
+        )))
         
-        # 6. 검출된 문제점
-        f.write("\n\n[6. 검출된 문제점]\n")
-        f.write("-" * 80 + "\n")
-        
-        unmatched_texts = [t for t in texts if not t.matched_arrows]
-        unmatched_leaders = [l for l in arrow_leaders if l.matched_text is None]
-        leaders_without_boundaries = [l for l in arrow_leaders if not l.matched_boundaries]
-        
-        f.write(f"⚠️ 매칭되지 않은 텍스트: {len(unmatched_texts)}개\n")
-        if unmatched_texts:
-            for text in unmatched_texts[:5]:
-                f.write(f"   - {text.handle}: \"{text.content}\" at {text.position}\n")
-        
-        f.write(f"\n⚠️ 텍스트가 없는 지시화살표선: {len(unmatched_leaders)}개\n")
-        if unmatched_leaders:
-            for leader in unmatched_leaders[:5]:
-                f.write(f"   - {leader.id} at {leader.leader_position}\n")
-        
-        f.write(f"\n⚠️ 지시경계선이 없는 지시화살표선: {len(leaders_without_boundaries)}개\n")
-        
-        # 7. 통계 요약
-        f.write("\n\n[7. 통계 요약]\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"총 치수/주석 엔티티    : {len(texts)}개\n")
-        f.write(f"탐지된 화살표          : {len(arrows)}개\n")
-        f.write(f"탐지된 지시화살표선      : {len(arrow_leaders)}개\n")
-        f.write(f"탐지된 지시경계선        : {len(boundary_lines)}개\n")
-        f.write(f"LEADER 엔티티          : {len(leaders)}개\n")
-        f.write(f"POLYLINE 엔티티        : {len(polylines)}개\n")
-        
-        matched_count = len([l for l in arrow_leaders if l.matched_text])
-        if len(arrow_leaders) > 0:
-            match_rate = (matched_count / len(arrow_leaders)) * 100
-            f.write(f"매칭 성공률              : {match_rate:.1f}%\n")
-        
-        f.write(f"처리된 레이어          : {len(layers)}개\n")
-        
-        # 푸터
-        f.write("\n" + "=" * 80 + "\n")
-        f.write(" " * 30 + "분석 보고서 끝\n")
-        f.write("=" * 80 + "\n")
+        # 꼭지점 정보
+        if vertices:
+            w(format_vertex_list(vertices))
+    
+    if n_polylines > 10:
+        w(f"\n... 외 {n_polylines - 10}개\n")
+    
+    # 6. 검출된 문제점
+    w("\n\n[6. 검출된 문제점]\n")
+    w(_DASH80)
+    
+    unmatched_texts = [t for t in texts if not t.matched_arrows]
+    
+    # 지시화살표선은 한 번만 돌면서 텍스트 미매칭/경계선 없음/매칭 수를 함께 집계
+    unmatched_leaders = []
+    leaders_without_boundaries = 0
+    matched_count = 0
+    for leader in arrow_leaders:
+        if leader.matched_text is None:
+            unmatched_leaders.append(leader)
+        else:
+            matched_count += 1
+        if not leader.matched_boundaries:
+            leaders_without_boundaries += 1
+    
+    w(f"⚠️ 매칭되지 않은 텍스트: {len(unmatched_texts)}개\n")
+    if unmatched_texts:
+        for text in unmatched_texts[:5]:
+            w(f"   - {text.handle}: \"{text.content}\" at {text.position}\n")
+    
+    w(f"\n⚠️ 텍스트가 없는 지시화살표선: {len(unmatched_leaders)}개\n")
+    if unmatched_leaders:
+        for leader in unmatched_leaders[:5]:
+            w(f"   - {leader.id} at {leader.leader_position}\n")
+    
+    w(f"\n⚠️ 지시경계선이 없는 지시화살표선: {leaders_without_boundaries}개\n")
+    
+    # 7. 통계 요약
+    w("\n\n[7. 통계 요약]\n")
+    w(_DASH80)
+    w(f"총 치수/주석 엔티티    : {n_texts}개\n")
+    w(f"탐지된 화살표          : {n_arrows}개\n")
+    w(f"탐지된 지시화살표선      : {n_arrow_leaders}개\n")
+    w(f"탐지된 지시경계선        : {n_boundary}개\n")
+    w(f"LEADER 엔티티          : {n_leaders}개\n")
+    w(f"POLYLINE 엔티티        : {n_polylines}개\n")
+    
+    if n_arrow_leaders > 0:
+        match_rate = (matched_count / n_arrow_leaders) * 100
+        w(f"매칭 성공률              : {match_rate:.1f}%\n")
+    
+    w(f"처리된 레이어          : {n_layers}개\n")
+    
+    # 푸터
+    w("\n" + _EQ80)
+    w(_FTR_TITLE)
+    w(_EQ80)
+    
+    # 전체를 한 번에 UTF-8로 인코딩해서 바이너리로 기록 (TextIOWrapper 단계 생략)
+    # 줄바꿈은 텍스트 모드로 쓰던 때와 같게 OS 기본값으로 맞춤
+    report = ''.join(parts)
+    if os.linesep != '\n':
+        report = report.replace('\n', os.linesep)
+    with _open_report(filename) as f:
+        f.write(report.encode('utf-8'))
     
     print(f"\n✓ 보고서 생성 완료: {filename}")
 
@@ -1062,6 +1394,11 @@ def generate_report(doc, layers, entities, texts, arrows, arrow_leaders, boundar
 # 메인 함수 (Main)
 # ============================================================================
 
+def _banner(title):
+    """단계 구분 배너 출력 (구분선/제목/구분선을 한 번에 기록)"""
+    sys.stdout.write(f"\n{_EQ80}{title}\n{_EQ80}")
+
+
 def main():
     """메인 실행 함수"""
 
@@ -1070,44 +1407,26 @@ def main():
     arrow_leaders = []
     boundary_lines = []
 
-    print("=" * 80)
-    print(" " * 25 + "CAD-Work: DXF 파일 분석")
-    print("=" * 80)
+    sys.stdout.write(f"{_EQ80}{' ' * 25}CAD-Work: DXF 파일 분석\n{_EQ80}")
     print(f"\n입력 파일: {INPUT_FILE}")
     print(f"출력 파일: {OUTPUT_REPORT}")
     
     # 1. DXF 파일 로드
-    print("\n" + "=" * 80)
-    print("1단계: DXF 파일 로드")
-    print("=" * 80)
+    _banner("1단계: DXF 파일 로드")
     doc = load_dxf_file(INPUT_FILE)
     if doc is None:
         return
     
-    # 2. 레이어 구조 분석
-    print("\n" + "=" * 80)
-    print("2단계: 레이어 구조 분석")
-    print("=" * 80)
-    layers = extract_layers(doc)
+    # 2. 모델 공간 파싱 (레이어 구조 분석 + 엔티티 분류 + LINE/TEXT/LEADER/POLYLINE 추출을 한 번에)
+    _banner("2단계: 레이어 구조 분석 및 엔티티 분류")
+    layers, entities, lines, line_array, texts, text_xy, leaders, polylines = parse_modelspace(doc)
     print(f"✓ 레이어 분석 완료: {len(layers)}개 레이어 발견")
-    
-    # 3. 엔티티 분류
-    print("\n" + "=" * 80)
-    print("3단계: 엔티티 분류")
-    print("=" * 80)
-    entities = classify_entities(doc)
     print(f"✓ 엔티티 분류 완료: {len(entities)}개 유형")
-    for entity_type, entity_list in sorted(entities.items()):
+    for entity_type, entity_list in entities.items():
         print(f"  {entity_type}: {len(entity_list)}개")
     
-    # 4. LINE 및 TEXT 추출
-    print("\n" + "=" * 80)
-    print("4단계: LINE, TEXT, LEADER, POLYLINE 추출")
-    print("=" * 80)
-    lines = extract_lines(entities)
-    texts = extract_texts(entities)
-    leaders = extract_leaders(entities)
-    polylines = extract_polylines(entities)
+    # 3. LINE, TEXT, LEADER, POLYLINE 추출 결과
+    _banner("3단계: LINE, TEXT, LEADER, POLYLINE 추출")
     print(f"✓ LINE 추출: {len(lines)}개")
     print(f"✓ TEXT/MTEXT 추출: {len(texts)}개")
     print(f"✓ LEADER 추출: {len(leaders)}개")
@@ -1119,41 +1438,29 @@ def main():
         # 51. 화살표 탐지
         # -> LINE 렌더 (들)에 화살표 형태인지를 확인
         # -> 좀 더 상세하게는, 다른 직선 2개의 대칭선의 역할을 해서, 3개의 직선이 꼭지점이 같은 지를 검사
-        print("\n" + "=" * 80)
-        print("51단계: 화살표 탐지")
-        print("=" * 80)
-        arrows = detect_arrows_in_drawing(lines, CONFIG)
+        _banner("51단계: 화살표 탐지")
+        arrows = detect_arrows_in_drawing(lines, line_array, CONFIG)
     
         # 52. 지시화살표선 생성
-        print("\n" + "=" * 80)
-        print("52단계: 지시화살표선 생성")
-        print("=" * 80)
-        arrow_leaders = create_arrow_leaders(arrows)
+        _banner("52단계: 지시화살표선 생성")
+        arrow_leaders, leader_xy = create_arrow_leaders(arrows)
         print(f"✓ 지시화살표선 생성: {len(arrow_leaders)}개")
 
         # 53. 지시경계선 탐지
-        print("\n" + "=" * 80)
-        print("53단계: 지시경계선 탐지")
-        print("=" * 80)
-        boundary_lines = detect_boundary_lines(arrow_leaders, lines, CONFIG)
+        _banner("53단계: 지시경계선 탐지")
+        boundary_lines = detect_boundary_lines(arrow_leaders, lines, line_array, CONFIG)
 
         # 54. 텍스트 매칭
-        print("\n" + "=" * 80)
-        print("54단계: 텍스트 매칭")
-        print("=" * 80)
-        arrow_leaders = match_texts_to_arrows(arrow_leaders, texts, CONFIG)
+        _banner("54단계: 텍스트 매칭")
+        arrow_leaders = match_texts_to_arrows(arrow_leaders, leader_xy, texts, text_xy, CONFIG)
 
     # 9. 보고서 생성
-    print("\n" + "=" * 80)
-    print("9단계: 보고서 생성")
-    print("=" * 80)
+    _banner("9단계: 보고서 생성")
     generate_report(doc, layers, entities, texts, arrows, arrow_leaders, 
                    boundary_lines, leaders, polylines, OUTPUT_REPORT)
     
     # 완료
-    print("\n" + "=" * 80)
-    print(" " * 30 + "분석 완료!")
-    print("=" * 80)
+    _banner(" " * 30 + "분석 완료!")
 
 
 if __name__ == "__main__":
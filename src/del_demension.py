@@ -10,12 +10,65 @@ DXF 파일에서 치수표기 및 주석을 제거하고 다른 파일로 저장
 
 import ezdxf
 import argparse
+import io
+import re
+import numpy as np
+from collections import Counter, defaultdict
 from pathlib import Path
+from point_grid import PointGrid
+
+
+def find_last_point_within(query_xy, grid, radius):
+    """
+    각 질의점에서 radius 이내에 있는 점 중 인덱스가 가장 큰 점 찾기
+    (점 목록을 순서대로 훑으며 조건을 만족할 때마다 덮어쓰던 결과와 같음)
+    
+    Parameters:
+        query_xy: 질의점 좌표 배열 (Q×2)
+        grid: 검색 대상 점의 PointGrid (셀 크기 >= radius)
+        radius: 검색 반경
+    
+    Returns:
+        질의점별 점 인덱스 배열 (없으면 -1)
+    """
+    result = np.full(len(query_xy), -1, dtype=np.intp)
+    q_idx, p_idx = grid.neighbors(query_xy)
+    diff = grid.point_xy[p_idx] - query_xy[q_idx]
+    hit = diff[:, 0]**2 + diff[:, 1]**2 <= radius * radius
+    np.maximum.at(result, q_idx[hit], p_idx[hit])
+    return result
+
+
+def collect_solid_vertices(solids):
+    """
+    SOLID 엔티티들의 네 꼭짓점 XY 좌표를 한 배열로 수집
+    (꼭짓점을 읽을 수 없는 SOLID는 건너뜀)
+    
+    Parameters:
+        solids: SOLID 엔티티 리스트
+    
+    Returns:
+        (valid_solids, vertices) - 읽기에 성공한 SOLID 리스트와 같은 순서의 좌표 배열 (N×4×2)
+    """
+    valid_solids = []
+    coords = []
+    for solid in solids:
+        try:
+            vertices = [solid.dxf.vtx0, solid.dxf.vtx1, solid.dxf.vtx2, solid.dxf.vtx3]
+            coords.append([(v[0], v[1]) for v in vertices])
+            valid_solids.append(solid)
+        except:
+            pass
+    return valid_solids, np.array(coords, dtype=np.float64).reshape(-1, 4, 2)
 
 
 class DXFCleaner:
     """DXF 파일 정리 클래스"""
     
+    # 치수 블록/레이어 이름 패턴 (대문자로 바꾼 이름에 한 번에 검색)
+    DIM_BLOCK_PATTERN = re.compile(r'_DIM|DIMENSION|_ARROW|DIMBLK')
+    DIM_LAYER_PATTERN = re.compile(r'DIM|DEFPOINTS')  # 'DIMENSION'은 'DIM'에 포함됨
+    
     def __init__(self, input_file):
         """
         Parameters:
@@ -42,6 +95,58 @@ class DXFCleaner:
             print(f"❌ 파일 로드 실패: {e}")
             return False
     
+    def _collect_by_type(self, msp):
+        """
+        모델 공간을 한 번만 순회하며 엔티티를 유형별로 분류
+        (유형마다 msp.query()로 전체를 다시 훑지 않도록 함)
+        
+        Returns:
+            {DXF 유형: [엔티티, ...]} (유형 안에서는 모델 공간 순서 유지, 없는 유형은 빈 리스트)
+        """
+        by_type = defaultdict(list)
+        for entity in msp:
+            by_type[entity.dxftype()].append(entity)
+        return by_type
+    
+    def _collect_records(self, msp):
+        """
+        모델 공간을 한 번만 순회하며 엔티티별 (엔티티, DXF 유형, 레이어 이름) 기록 수집
+        (레이어 이름을 여러 단계에서 다시 읽지 않도록 함)
+        
+        Returns:
+            (by_type, records) - {DXF 유형: [엔티티, ...]}와 모델 공간 순서의 기록 리스트
+        """
+        by_type = defaultdict(list)
+        records = []
+        for entity in msp:
+            dxftype = entity.dxftype()
+            by_type[dxftype].append(entity)
+            records.append((entity, dxftype, entity.dxf.layer))
+        return by_type, records
+    
+    def _delete_entities(self, msp, entities):
+        """
+        엔티티 일괄 삭제
+        
+        msp.delete_entity()는 호출할 때마다 엔티티 목록 전체에서 해당 엔티티를 찾아 지우므로,
+        먼저 모두 파기(destroy)한 뒤 파기된 엔티티를 목록에서 한 번에 정리(purge)함
+        
+        Parameters:
+            msp: 엔티티가 들어있는 레이아웃 (모델 공간)
+            entities: 삭제할 엔티티 목록
+        
+        Returns:
+            실제로 삭제된 개수 (이미 삭제된 엔티티는 제외)
+        """
+        count = 0
+        for entity in entities:
+            if entity.is_alive:
+                entity.destroy()
+                count += 1
+        if count:
+            msp.purge()
+        return count
+    
     def remove_dimensions(self, remove_dimension_blocks=True):
         """
         치수 제거 (보조선, 화살표 포함)
@@ -54,13 +159,11 @@ class DXFCleaner:
             return 0
         
         msp = self.doc.modelspace()
+        by_type, records = self._collect_records(msp)
         count = 0
         
         # 1. DIMENSION 엔티티 찾기 및 삭제
-        dimensions = list(msp.query('DIMENSION'))
-        for dim in dimensions:
-            msp.delete_entity(dim)
-            count += 1
+        count += self._delete_entities(msp, by_type['DIMENSION'])
         
         print(f"  🗑️ 치수(DIMENSION) 엔티티: {count}개")
         
@@ -68,42 +171,31 @@ class DXFCleaner:
         # 치수가 explode되면 LINE, SOLID, INSERT 등으로 분해됨
         
         # 화살표 (SOLID 엔티티 - 작은 삼각형)
-        solids = list(msp.query('SOLID'))
-        arrow_count = 0
-        for solid in solids:
-            # 작은 SOLID는 화살표일 가능성이 높음
-            try:
-                vertices = [solid.dxf.vtx0, solid.dxf.vtx1, solid.dxf.vtx2, solid.dxf.vtx3]
-                # 크기 계산
-                x_coords = [v[0] for v in vertices]
-                y_coords = [v[1] for v in vertices]
-                width = max(x_coords) - min(x_coords)
-                height = max(y_coords) - min(y_coords)
-                size = max(width, height)
-                
-                # 10mm 이하의 작은 SOLID는 화살표로 간주
-                if size < 10:
-                    msp.delete_entity(solid)
-                    arrow_count += 1
-            except:
-                pass
+        # 작은 SOLID는 화살표일 가능성이 높음
+        solids, vertices = collect_solid_vertices(by_type['SOLID'])
+        # 크기 계산 (가로/세로 폭 중 큰 값)
+        size = np.maximum(np.ptp(vertices[:, :, 0], axis=1), np.ptp(vertices[:, :, 1], axis=1))
+        # 10mm 이하의 작은 SOLID는 화살표로 간주
+        small_solids = [solids[i] for i in np.flatnonzero(size < 10).tolist()]
+        arrow_count = self._delete_entities(msp, small_solids)
         
         if arrow_count > 0:
             print(f"  🗑️ 화살표(SOLID): {arrow_count}개")
             count += arrow_count
         
         # 3. 치수선 관련 작은 LINE 제거 (선택적)
-        lines = list(msp.query('LINE'))
-        dim_line_count = 0
-        for line in lines:
-            try:
-                # 레이어 이름에 'DIM', 'DIMENSION' 포함된 경우
-                layer_name = line.dxf.layer.upper()
-                if 'DIM' in layer_name or 'DIMENSION' in layer_name:
-                    msp.delete_entity(line)
-                    dim_line_count += 1
-            except:
-                pass
+        dim_lines = []
+        is_dim_layer = {}  # 레이어 이름 → 판정 결과 (이름마다 대문자 변환은 한 번만)
+        for entity, dxftype, layer_name in records:
+            if dxftype != 'LINE':
+                continue
+            # 레이어 이름에 'DIM', 'DIMENSION' 포함된 경우 ('DIMENSION'은 'DIM'에 포함됨)
+            matched = is_dim_layer.get(layer_name)
+            if matched is None:
+                matched = is_dim_layer[layer_name] = 'DIM' in layer_name.upper()
+            if matched:
+                dim_lines.append(entity)
+        dim_line_count = self._delete_entities(msp, dim_lines)
         
         if dim_line_count > 0:
             print(f"  🗑️ 치수 레이어 선(LINE): {dim_line_count}개")
@@ -115,9 +207,8 @@ class DXFCleaner:
             blocks_to_remove = []
             
             for block in self.doc.blocks:
-                block_name = block.name.upper()
                 # 일반적인 치수 블록 이름 패턴
-                if any(pattern in block_name for pattern in ['_DIM', 'DIMENSION', '_ARROW', 'DIMBLK']):
+                if self.DIM_BLOCK_PATTERN.search(block.name.upper()):
                     blocks_to_remove.append(block.name)
                     block_count += 1
             
@@ -131,16 +222,20 @@ class DXFCleaner:
                 print(f"  🗑️ 치수 블록 정의: {block_count}개")
         
         # 5. INSERT 엔티티 중 치수 관련 제거
-        inserts = list(msp.query('INSERT'))
-        insert_count = 0
+        inserts = by_type['INSERT']
+        dim_inserts = []
+        is_dim_block = {}  # 블록 이름 → 판정 결과
         for insert in inserts:
             try:
-                block_name = insert.dxf.name.upper()
-                if any(pattern in block_name for pattern in ['_DIM', 'DIMENSION', '_ARROW', 'DIMBLK']):
-                    msp.delete_entity(insert)
-                    insert_count += 1
+                block_name = insert.dxf.name
+                matched = is_dim_block.get(block_name)
+                if matched is None:
+                    matched = is_dim_block[block_name] = self.DIM_BLOCK_PATTERN.search(block_name.upper()) is not None
+                if matched:
+                    dim_inserts.append(insert)
             except:
                 pass
+        insert_count = self._delete_entities(msp, dim_inserts)
         
         if insert_count > 0:
             print(f"  🗑️ 치수 블록 참조(INSERT): {insert_count}개")
@@ -149,22 +244,21 @@ class DXFCleaner:
         # 6. 치수 레이어 제거
         layer_count = 0
         entity_count = 0
-        dim_layer_patterns = ['DIM', 'DIMENSION', 'DEFPOINTS']
         
         layers_to_remove = []
         for layer in self.doc.layers:
-            layer_name_upper = layer.dxf.name.upper()
-            if any(pattern in layer_name_upper for pattern in dim_layer_patterns):
+            if self.DIM_LAYER_PATTERN.search(layer.dxf.name.upper()):
                 layers_to_remove.append(layer.dxf.name)
         
+        # 처음 수집한 기록으로 레이어별 분류 (앞 단계에서 삭제된 엔티티는 제외)
+        by_layer = defaultdict(list)
+        if layers_to_remove:
+            for entity, _, layer_name in records:
+                if entity.is_alive:
+                    by_layer[layer_name].append(entity)
+        
         for layer_name in layers_to_remove:
-            entities = list(msp.query(f'*[layer=="{layer_name}"]'))
-            for entity in entities:
-                try:
-                    msp.delete_entity(entity)
-                    entity_count += 1
-                except:
-                    pass
+            entity_count += self._delete_entities(msp, by_layer[layer_name])
             layer_count += 1
         
         for layer_name in layers_to_remove:
@@ -189,38 +283,31 @@ class DXFCleaner:
             return 0
         
         msp = self.doc.modelspace()
+        by_type = self._collect_by_type(msp)
         total = 0
         
         # TEXT 제거
-        texts = list(msp.query('TEXT'))
-        for text in texts:
-            msp.delete_entity(text)
-            self.removed_count['texts'] += 1
+        texts = by_type['TEXT']
+        self.removed_count['texts'] += self._delete_entities(msp, texts)
         print(f"  🗑️ 텍스트(TEXT): {len(texts)}개")
         total += len(texts)
         
         # MTEXT 제거
-        mtexts = list(msp.query('MTEXT'))
-        for mtext in mtexts:
-            msp.delete_entity(mtext)
-            self.removed_count['mtexts'] += 1
+        mtexts = by_type['MTEXT']
+        self.removed_count['mtexts'] += self._delete_entities(msp, mtexts)
         print(f"  🗑️ 멀티텍스트(MTEXT): {len(mtexts)}개")
         total += len(mtexts)
         
         # LEADER 제거
-        leaders = list(msp.query('LEADER'))
-        for leader in leaders:
-            msp.delete_entity(leader)
-            self.removed_count['leaders'] += 1
+        leaders = by_type['LEADER']
+        self.removed_count['leaders'] += self._delete_entities(msp, leaders)
         print(f"  🗑️ 지시선(LEADER): {len(leaders)}개")
         total += len(leaders)
         
         # MULTILEADER 제거
         try:
-            multileaders = list(msp.query('MULTILEADER'))
-            for mleader in multileaders:
-                msp.delete_entity(mleader)
-                self.removed_count['multileaders'] += 1
+            multileaders = by_type['MULTILEADER']
+            self.removed_count['multileaders'] += self._delete_entities(msp, multileaders)
             print(f"  🗑️ 다중지시선(MULTILEADER): {len(multileaders)}개")
             total += len(multileaders)
         except:
@@ -245,16 +332,17 @@ class DXFCleaner:
             return 0
         
         msp = self.doc.modelspace()
+        by_type = self._collect_by_type(msp)
         
-        # 로그 파일 열기
-        log_file = open('output.txt', 'w', encoding='utf-8')
+        # 로그는 메모리에 모아 두었다가 끝에서 output.txt에 한 번에 기록
+        log_file = io.StringIO()
         log_file.write("="*80 + "\n")
         log_file.write("치수 보조선 탐색 로그\n")
         log_file.write("="*80 + "\n\n")
         
         # 1. 모든 TEXT 위치 수집
         text_positions = []
-        for text in msp.query('TEXT'):
+        for text in by_type['TEXT']:
             try:
                 pos = text.dxf.insert
                 text_positions.append({
@@ -264,7 +352,7 @@ class DXFCleaner:
             except:
                 pass
         
-        for mtext in msp.query('MTEXT'):
+        for mtext in by_type['MTEXT']:
             try:
                 pos = mtext.dxf.insert
                 text_positions.append({
@@ -276,48 +364,43 @@ class DXFCleaner:
         
         if not text_positions:
             print("  ℹ️ TEXT가 없어 보조선 제거를 건너뜁니다")
-            log_file.close()
+            Path('output.txt').write_text(log_file.getvalue(), encoding='utf-8')
             return 0
         
         print(f"  📍 TEXT 위치 {len(text_positions)}개 발견")
         log_file.write(f"TEXT 위치 {len(text_positions)}개 발견\n\n")
         
-        # 2. 화살표(SOLID) 수집
-        arrows = []
-        for solid in msp.query('SOLID'):
-            try:
-                vertices = [solid.dxf.vtx0, solid.dxf.vtx1, solid.dxf.vtx2, solid.dxf.vtx3]
-                center_x = sum(v[0] for v in vertices) / 4
-                center_y = sum(v[1] for v in vertices) / 4
-                arrows.append({
-                    'entity': solid,
-                    'center': (center_x, center_y)
-                })
-            except:
-                pass
+        # 2. 화살표(SOLID) 수집 - 중심 좌표 배열 (A×2) + 같은 순서의 엔티티 리스트
+        arrow_entities, vertices = collect_solid_vertices(by_type['SOLID'])
+        arrow_xy = vertices.mean(axis=1)
         
-        print(f"  🎯 화살표(SOLID) {len(arrows)}개 발견")
-        log_file.write(f"화살표(SOLID) {len(arrows)}개 발견\n\n")
+        print(f"  🎯 화살표(SOLID) {len(arrow_entities)}개 발견")
+        log_file.write(f"화살표(SOLID) {len(arrow_entities)}개 발견\n\n")
         
-        # 3. LINE 수집
-        lines = list(msp.query('LINE'))
-        line_data = []
+        # 화살표가 없으면 보조선 후보도 없음 - LINE 수집과 탐색을 건너뜀
+        if not arrow_entities:
+            print("  ℹ️ 화살표가 없어 보조선 제거를 건너뜁니다")
+            Path('output.txt').write_text(log_file.getvalue(), encoding='utf-8')
+            return 0
+        
+        # 화살표 중심 격자 색인 (선 시작점/끝점 검색에 함께 사용 - 셀 크기 = 부착 판정 거리 5mm)
+        arrow_grid = PointGrid(arrow_xy, 5)
         
-        for line in lines:
+        # 3. LINE 수집 - 끝점 좌표 배열 (L×4: 시작x, 시작y, 끝x, 끝y) + 같은 순서의 엔티티 리스트
+        line_entities = []
+        line_coords = []
+        for line in by_type['LINE']:
             try:
                 start = line.dxf.start
                 end = line.dxf.end
-                line_data.append({
-                    'entity': line,
-                    'start': (start.x, start.y),
-                    'end': (end.x, end.y),
-                    'length': ((end.x - start.x)**2 + (end.y - start.y)**2)**0.5
-                })
+                line_coords.append((start.x, start.y, end.x, end.y))
+                line_entities.append(line)
             except:
                 pass
+        line_xy = np.array(line_coords, dtype=np.float64).reshape(-1, 4)
         
-        print(f"  📏 LINE {len(line_data)}개 발견")
-        log_file.write(f"LINE {len(line_data)}개 발견\n\n")
+        print(f"  📏 LINE {len(line_entities)}개 발견")
+        log_file.write(f"LINE {len(line_entities)}개 발견\n\n")
         
         # 4. 사전 필터링: 화살표가 붙은 선들만 추출
         print(f"  🔍 사전 필터링 중... (화살표 연결 확인)")
@@ -325,12 +408,12 @@ class DXFCleaner:
         log_file.write("1단계: 화살표가 붙은 LINE 사전 필터링\n")
         log_file.write("="*80 + "\n\n")
         
-        auxiliary_candidates = self._build_auxiliary_candidates(
-            line_data, arrows, log_file
+        cand_line_idx, cand_line2_idx, cand_arrow_idx, cand_xy = self._build_auxiliary_candidates(
+            line_xy, arrow_grid, log_file
         )
         
-        print(f"  ✅ 보조선 후보 {len(auxiliary_candidates)}개 발견")
-        log_file.write(f"\n총 보조선 후보: {len(auxiliary_candidates)}개\n\n")
+        print(f"  ✅ 보조선 후보 {len(cand_xy)}개 발견")
+        log_file.write(f"\n총 보조선 후보: {len(cand_xy)}개\n\n")
         
         # 5. TEXT 주변 탐색
         print(f"  🔍 TEXT 주변 탐색 시작 (반경 {search_radius}mm)")
@@ -338,8 +421,27 @@ class DXFCleaner:
         log_file.write(f"2단계: TEXT 주변 탐색 (반경 {search_radius}mm)\n")
         log_file.write("="*80 + "\n\n")
         
-        lines_to_remove = set()
-        arrows_to_remove = set()
+        # TEXT 주변에서 발견된 후보 표시 (후보 배열과 같은 순서의 불리언 마스크)
+        matched = np.zeros(len(cand_xy), dtype=bool)
+        cand_rows = cand_xy.tolist()
+        cand_line_counts = np.where(cand_line2_idx >= 0, 2, 1).tolist()
+        
+        # 후보 시작점 격자 색인으로 TEXT별 반경 안 후보를 한 번에 찾음 (거리 제곱으로 비교)
+        # → TEXT k의 후보는 [bounds[k], bounds[k+1]) 구간, 후보 순서대로 정렬됨
+        text_xy = np.array([text_info['pos'] for text_info in text_positions], dtype=np.float64).reshape(-1, 2)
+        # TEXT 전체 영역(반경만큼 확장) 밖의 후보는 색인하지 않음 (경계 상자 사전 필터)
+        box_min = text_xy.min(axis=0) - search_radius
+        box_max = text_xy.max(axis=0) + search_radius
+        in_box = np.flatnonzero(np.all((cand_xy >= box_min) & (cand_xy <= box_max), axis=1))
+        text_idx, box_idx = PointGrid(cand_xy[in_box], search_radius if search_radius > 0 else 1.0).neighbors(text_xy)
+        cand_idx = in_box[box_idx]
+        diff = cand_xy[cand_idx] - text_xy[text_idx]
+        dists_sq = diff[:, 0]**2 + diff[:, 1]**2
+        hit = np.flatnonzero((dists_sq <= search_radius * search_radius) & (search_radius >= 0))
+        order = np.lexsort((cand_idx[hit], text_idx[hit]))
+        hit_cands = cand_idx[hit][order].tolist()
+        hit_dists_sq = dists_sq[hit][order].tolist()
+        bounds = np.searchsorted(text_idx[hit][order], np.arange(len(text_positions) + 1)).tolist()
         
         for idx, text_info in enumerate(text_positions, 1):
             tx, ty = text_info['pos']
@@ -349,24 +451,17 @@ class DXFCleaner:
             
             found_count = 0
             
-            # 후보 리스트에서만 검색
-            for candidate in auxiliary_candidates:
-                start_x, start_y = candidate['start_point']
-                dist = ((start_x - tx)**2 + (start_y - ty)**2)**0.5
+            # 반경 안에 든 후보만 후보 순서대로 처리
+            for k in range(bounds[idx - 1], bounds[idx]):
+                cand = hit_cands[k]
+                start_x, start_y = cand_rows[cand]
+                dist = hit_dists_sq[k] ** 0.5  # 로그 출력용
+                found_count += 1
+                matched[cand] = True
                 
-                if dist <= search_radius:
-                    found_count += 1
-                    
-                    # 선들 제거 표시
-                    for line in candidate['lines']:
-                        lines_to_remove.add(id(line['entity']))
-                    
-                    # 화살표 제거 표시
-                    arrows_to_remove.add(id(candidate['arrow']['entity']))
-                    
-                    log_file.write(f"  → 보조선 발견! 거리: {dist:.2f}mm, ")
-                    log_file.write(f"선 개수: {len(candidate['lines'])}개, ")
-                    log_file.write(f"시작점: ({start_x:.2f}, {start_y:.2f})\n")
+                log_file.write(f"  → 보조선 발견! 거리: {dist:.2f}mm, ")
+                log_file.write(f"선 개수: {cand_line_counts[cand]}개, ")
+                log_file.write(f"시작점: ({start_x:.2f}, {start_y:.2f})\n")
             
             if found_count > 0:
                 print(f"    TEXT {idx}/{len(text_positions)} → 보조선 {found_count}개 발견")
@@ -374,24 +469,19 @@ class DXFCleaner:
             else:
                 log_file.write(f"  결과: 보조선 없음\n\n")
         
-        # 6. 제거 실행
-        removed_lines = 0
-        for ld in line_data:
-            if id(ld['entity']) in lines_to_remove:
-                try:
-                    msp.delete_entity(ld['entity'])
-                    removed_lines += 1
-                except:
-                    pass
-        
-        removed_arrows = 0
-        for arrow in arrows:
-            if id(arrow['entity']) in arrows_to_remove:
-                try:
-                    msp.delete_entity(arrow['entity'])
-                    removed_arrows += 1
-                except:
-                    pass
+        # 6. 제거 실행 - 발견된 후보의 선/화살표 인덱스만 모아서 엔티티로 변환
+        lines_to_remove = np.zeros(len(line_entities), dtype=bool)
+        arrows_to_remove = np.zeros(len(arrow_entities), dtype=bool)
+        lines_to_remove[cand_line_idx[matched]] = True
+        second_lines = cand_line2_idx[matched]
+        lines_to_remove[second_lines[second_lines >= 0]] = True
+        arrows_to_remove[cand_arrow_idx[matched]] = True
+        removed_lines = self._delete_entities(
+            msp, [line_entities[i] for i in np.flatnonzero(lines_to_remove).tolist()]
+        )
+        removed_arrows = self._delete_entities(
+            msp, [arrow_entities[i] for i in np.flatnonzero(arrows_to_remove).tolist()]
+        )
         
         total = removed_lines + removed_arrows
         
@@ -401,7 +491,7 @@ class DXFCleaner:
         log_file.write(f"제거된 LINE: {removed_lines}개\n")
         log_file.write(f"제거된 화살표: {removed_arrows}개\n")
         log_file.write(f"총 제거: {total}개\n")
-        log_file.close()
+        Path('output.txt').write_text(log_file.getvalue(), encoding='utf-8')
         
         if removed_lines > 0:
             print(f"  🗑️ 치수선(LINE): {removed_lines}개")
@@ -413,100 +503,118 @@ class DXFCleaner:
         
         return total
     
-    def _build_auxiliary_candidates(self, line_data, arrows, log_file):
-        """
-        화살표가 붙은 선들을 사전 필터링하여 보조선 후보 리스트 생성
+    def _build_auxiliary_candidates(self, line_xy, arrow_grid, log_file):
         """
-        candidates = []
+        화살표가 붙은 선들을 사전 필터링하여 보조선 후보 배열 생성
+        
+        Parameters:
+            line_xy: LINE 끝점 좌표 배열 (L×4: 시작x, 시작y, 끝x, 끝y)
+            arrow_grid: 화살표(SOLID) 중심 좌표의 PointGrid (셀 크기 >= 5mm)
+            log_file: 로그 파일
         
-        for idx, line in enumerate(line_data):
-            # 화살표가 끝점에 붙어있는지 확인
-            arrow_at_start = None
-            arrow_at_end = None
+        Returns:
+            (cand_line_idx, cand_line2_idx, cand_arrow_idx, cand_xy) - 후보별 배열
+            (화살표가 붙은 선, 꺾인 보조선의 연결선 또는 -1 (직선), 화살표 인덱스, 시작점 좌표 (N×2))
+        """
+        cand_line_idx = []
+        cand_line2_idx = []
+        cand_arrow_idx = []
+        cand_starts = []
+        
+        # 화살표가 끝점(5mm 이내)에 붙어있는지 격자 색인으로 한 번에 확인
+        # (여러 개면 화살표 목록에서 마지막 것 - 기존 순차 탐색과 같은 결과)
+        arrow_at_start_idx = find_last_point_within(line_xy[:, 0:2], arrow_grid, 5)
+        arrow_at_end_idx = find_last_point_within(line_xy[:, 2:4], arrow_grid, 5)
+        
+        # 선마다 좌표를 (시작x, 시작y, 끝x, 끝y) 튜플로 꺼내 둠
+        line_rows = [tuple(row) for row in line_xy.tolist()]
+        
+        # 화살표가 있는 선만 처리 - 화살표 반대쪽이 임시 시작점
+        has_arrow = (arrow_at_start_idx >= 0) | (arrow_at_end_idx >= 0)
+        arrow_lines = np.flatnonzero(has_arrow)
+        temp_xy = np.where((arrow_at_end_idx[arrow_lines] >= 0)[:, None],
+                           line_xy[arrow_lines, 0:2], line_xy[arrow_lines, 2:4])
+        
+        # 임시 시작점 3mm 이내에 시작점/끝점이 있는 선만 연결선 후보로 추림 (격자 색인)
+        # → 선별 후보 [bounds[k], bounds[k+1]) 구간, 선 순서대로 정렬됨
+        n_lines = len(line_xy)
+        endpoint_xy = np.concatenate([line_xy[:, 0:2], line_xy[:, 2:4]])
+        q_idx, p_idx = PointGrid(endpoint_xy, 3).neighbors(temp_xy)
+        diff = endpoint_xy[p_idx] - temp_xy[q_idx]
+        near = diff[:, 0]**2 + diff[:, 1]**2 <= 9
+        pair_keys = np.unique(q_idx[near] * n_lines + p_idx[near] % n_lines)
+        near_lines = (pair_keys % n_lines).tolist()
+        bounds = np.searchsorted(pair_keys // n_lines, np.arange(len(arrow_lines) + 1)).tolist()
+        
+        for k, idx in enumerate(arrow_lines.tolist()):
+            line = line_rows[idx]
+            start_idx, end_idx = int(arrow_at_start_idx[idx]), int(arrow_at_end_idx[idx])
             
-            for arrow in arrows:
-                ax, ay = arrow['center']
-                
-                dist_to_start = ((ax - line['start'][0])**2 + (ay - line['start'][1])**2)**0.5
-                dist_to_end = ((ax - line['end'][0])**2 + (ay - line['end'][1])**2)**0.5
-                
-                if dist_to_start <= 5:
-                    arrow_at_start = arrow
-                if dist_to_end <= 5:
-                    arrow_at_end = arrow
+            # 화살표 반대쪽이 임시 시작점
+            if end_idx >= 0:
+                temp_start = line[0:2]
+                current_arrow = end_idx
+            else:
+                temp_start = line[2:4]
+                current_arrow = start_idx
             
-            # 화살표가 있는 경우만 처리
-            if arrow_at_start or arrow_at_end:
-                # 화살표 반대쪽이 임시 시작점
-                if arrow_at_end:
-                    temp_start = line['start']
-                    arrow_point = line['end']
-                    current_arrow = arrow_at_end
-                else:
-                    temp_start = line['end']
-                    arrow_point = line['start']
-                    current_arrow = arrow_at_start
+            # 임시 시작점에 다른 선이 연결되어 있는지 확인 (한번 꺾인 보조선)
+            # (가까운 선만 선 순서대로 검사 - 전체 선을 훑던 것과 같은 결과)
+            connected_idx = None
+            for other_idx in near_lines[bounds[k]:bounds[k + 1]]:
+                other_line = line_rows[other_idx]
+                if other_idx == idx:
+                    continue
                 
-                # 임시 시작점에 다른 선이 연결되어 있는지 확인 (한번 꺾인 보조선)
-                connected_line = None
-                for other_line in line_data:
-                    if id(other_line['entity']) == id(line['entity']):
-                        continue
-                    
-                    # 임시 시작점과 가까운 점이 있는지
-                    dist_to_start = ((other_line['start'][0] - temp_start[0])**2 + 
-                                    (other_line['start'][1] - temp_start[1])**2)**0.5
-                    dist_to_end = ((other_line['end'][0] - temp_start[0])**2 + 
-                                  (other_line['end'][1] - temp_start[1])**2)**0.5
-                    
-                    if dist_to_start <= 3:
-                        # 각도가 다른지 확인
-                        if self._is_different_angle(line, other_line):
-                            connected_line = other_line
-                            final_start = other_line['end']
-                            break
-                    elif dist_to_end <= 3:
-                        if self._is_different_angle(line, other_line):
-                            connected_line = other_line
-                            final_start = other_line['start']
-                            break
+                # 임시 시작점과 가까운 점이 있는지 (거리 제곱으로 비교, 3mm → 9)
+                dist_to_start_sq = ((other_line[0] - temp_start[0])**2 + 
+                                    (other_line[1] - temp_start[1])**2)
+                dist_to_end_sq = ((other_line[2] - temp_start[0])**2 + 
+                                  (other_line[3] - temp_start[1])**2)
                 
-                # 후보 등록
-                if connected_line:
-                    # 한번 꺾인 보조선
-                    candidates.append({
-                        'lines': [line, connected_line],
-                        'start_point': final_start,
-                        'arrow': current_arrow,
-                        'type': 'bent'
-                    })
-                    log_file.write(f"후보 {len(candidates)}: 한번 꺾인 보조선 ")
-                    log_file.write(f"시작점({final_start[0]:.2f}, {final_start[1]:.2f})\n")
-                else:
-                    # 직선 보조선
-                    candidates.append({
-                        'lines': [line],
-                        'start_point': temp_start,
-                        'arrow': current_arrow,
-                        'type': 'straight'
-                    })
-                    log_file.write(f"후보 {len(candidates)}: 직선 보조선 ")
-                    log_file.write(f"시작점({temp_start[0]:.2f}, {temp_start[1]:.2f})\n")
-        
-        return candidates
+                if dist_to_start_sq <= 9:
+                    # 각도가 다른지 확인
+                    if self._is_different_angle(line, other_line):
+                        connected_idx = other_idx
+                        final_start = other_line[2:4]
+                        break
+                elif dist_to_end_sq <= 9:
+                    if self._is_different_angle(line, other_line):
+                        connected_idx = other_idx
+                        final_start = other_line[0:2]
+                        break
+            
+            # 후보 등록
+            cand_line_idx.append(idx)
+            cand_arrow_idx.append(current_arrow)
+            if connected_idx is not None:
+                # 한번 꺾인 보조선
+                cand_line2_idx.append(connected_idx)
+                cand_starts.append(final_start)
+                log_file.write(f"후보 {len(cand_starts)}: 한번 꺾인 보조선 ")
+                log_file.write(f"시작점({final_start[0]:.2f}, {final_start[1]:.2f})\n")
+            else:
+                # 직선 보조선
+                cand_line2_idx.append(-1)
+                cand_starts.append(temp_start)
+                log_file.write(f"후보 {len(cand_starts)}: 직선 보조선 ")
+                log_file.write(f"시작점({temp_start[0]:.2f}, {temp_start[1]:.2f})\n")
+        
+        return (np.array(cand_line_idx, dtype=np.intp), np.array(cand_line2_idx, dtype=np.intp),
+                np.array(cand_arrow_idx, dtype=np.intp), np.array(cand_starts, dtype=np.float64).reshape(-1, 2))
     
     def _is_different_angle(self, line1, line2, angle_threshold=10):
-        """두 선의 각도가 충분히 다른지 확인 (10도 이상 차이)"""
+        """두 선의 각도가 충분히 다른지 확인 (10도 이상 차이, 선은 (시작x, 시작y, 끝x, 끝y))"""
         import math
         
         # line1의 각도
-        dx1 = line1['end'][0] - line1['start'][0]
-        dy1 = line1['end'][1] - line1['start'][1]
+        dx1 = line1[2] - line1[0]
+        dy1 = line1[3] - line1[1]
         angle1 = math.atan2(dy1, dx1) * 180 / math.pi
         
         # line2의 각도
-        dx2 = line2['end'][0] - line2['start'][0]
-        dy2 = line2['end'][1] - line2['start'][1]
+        dx2 = line2[2] - line2[0]
+        dy2 = line2[3] - line2[1]
         angle2 = math.atan2(dy2, dx2) * 180 / math.pi
         
         # 각도 차이
@@ -603,15 +711,18 @@ class DXFCleaner:
         
         msp = self.doc.modelspace()
         
+        # 유형별 개수를 한 번의 순회로 집계
+        type_counts = Counter(entity.dxftype() for entity in msp)
+        
         stats = {
-            'dimensions': len(list(msp.query('DIMENSION'))),
-            'texts': len(list(msp.query('TEXT'))),
-            'mtexts': len(list(msp.query('MTEXT'))),
-            'leaders': len(list(msp.query('LEADER'))),
-            'lines': len(list(msp.query('LINE'))),
-            'circles': len(list(msp.query('CIRCLE'))),
-            'polylines': len(list(msp.query('LWPOLYLINE'))),
-            'arcs': len(list(msp.query('ARC')))
+            'dimensions': type_counts['DIMENSION'],
+            'texts': type_counts['TEXT'],
+            'mtexts': type_counts['MTEXT'],
+            'leaders': type_counts['LEADER'],
+            'lines': type_counts['LINE'],
+            'circles': type_counts['CIRCLE'],
+            'polylines': type_counts['LWPOLYLINE'],
+            'arcs': type_counts['ARC']
         }
         
         return stats
@@ -6,95 +6,254 @@
 4. 새 파일로 저장
 """
 
+import os
 import sys
 import argparse
+import functools
+import hashlib
+import pickle
+import tempfile
 import ezdxf
-from ezdxf.math import Vec3
+import numpy as np
+from collections import defaultdict
+from pathlib import Path
 from ezdxf.enums import TextEntityAlignment
 
 
+def read_dxf(filename, cache_dir=None):
+    """
+    DXF 파일 읽기 (cache_dir를 주면 파싱된 문서를 파일 내용 해시로 캐시)
+    
+    같은 내용의 파일을 다시 읽을 때는 DXF 파싱 대신 pickle을 불러옴.
+    캐시 키에 ezdxf 버전을 포함하므로 버전이 바뀌면 다시 파싱함.
+    
+    Parameters:
+        filename: DXF 파일 경로
+        cache_dir: 캐시 디렉토리 (None이면 캐시 사용 안 함)
+    
+    Returns:
+        ezdxf 문서
+    """
+    if cache_dir is None:
+        return ezdxf.readfile(filename)
+    
+    key = hashlib.sha256(Path(filename).read_bytes()).hexdigest()
+    cache_file = Path(cache_dir) / f"{key}-ezdxf{ezdxf.__version__}.pkl"
+    if cache_file.exists():
+        try:
+            doc = pickle.loads(cache_file.read_bytes())
+            doc.filename = filename
+            return doc
+        except Exception:
+            pass  # 손상된 캐시는 무시하고 다시 파싱
+    
+    doc = ezdxf.readfile(filename)
+    
+    # 캐시 저장은 실패해도 무시 (이미 파싱한 문서는 그대로 반환)
+    # 여러 프로세스가 같은 키를 동시에 쓸 수 있으므로 임시 파일에 다 쓴 뒤 교체
+    tmp_name = None
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        data = pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+        with tempfile.NamedTemporaryFile(dir=cache_file.parent, suffix='.tmp', delete=False) as f:
+            tmp_name = f.name
+            f.write(data)
+        os.replace(tmp_name, cache_file)
+    except Exception:
+        if tmp_name is not None:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+    return doc
+
+
+class RecordsView:
+    """
+    원/호 배열을 결과용 dict 목록처럼 보여주는 읽기 전용 뷰
+    
+    [{'center': (x, y), 'radius': r(, 'diameter': d)}, ...] 목록을 미리 만들지 않고
+    항목을 꺼낼 때만 dict를 만듦 (len, 인덱스/슬라이스, 반복, ==, repr은 목록과 같음)
+    """
+    
+    def __init__(self, centers, radii, with_diameter=False):
+        """
+        Parameters:
+            centers: 중심 좌표 배열 (N×3 또는 N×2)
+            radii: 반지름 배열 (N)
+            with_diameter: True면 항목에 'diameter' 포함 (원)
+        """
+        self._centers = centers
+        self._radii = radii
+        self._with_diameter = with_diameter
+    
+    def __len__(self):
+        return len(self._radii)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        x, y = self._centers[i, :2].tolist()
+        r = self._radii[i].item()
+        if self._with_diameter:
+            return {'center': (x, y), 'radius': r, 'diameter': r * 2}
+        return {'center': (x, y), 'radius': r}
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __eq__(self, other):
+        if isinstance(other, (list, RecordsView)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self):
+        return repr(list(self))
+
+
 class DXFDimensionAnalyzer:
     """DXF 파일 치수 분석 및 자동 치수 추가 클래스"""
     
-    def __init__(self, filename):
+    def __init__(self, filename, verbose=True, cache_dir=None):
         self.filename = filename
-        self.doc = ezdxf.readfile(filename)
+        self.verbose = verbose  # False면 진행 메시지 생략 (요약은 print_summary로 따로 출력)
+        self.doc = read_dxf(filename, cache_dir)
         self.msp = self.doc.modelspace()
         self.dimensions = {}
+        self._bbox_cache = {}  # 폴리라인 핸들 → (min_x, min_y, max_x, max_y)
+        # 원/호는 중심 좌표 (N×3, z=0 - 치수 생성에 그대로 전달)와 반지름 (N) 배열로 보관
+        # (dimensions의 'circles'/'arcs'는 이 배열 위의 RecordsView)
+        self._circle_centers = np.empty((0, 3))
+        self._circle_radii = np.empty(0)
+        self._arc_centers = np.empty((0, 3))
+        self._arc_radii = np.empty(0)
         
     def analyze(self):
         """형상 분석하여 치수 추출"""
-        print(f"\n🔍 분석 중: {self.filename}")
+        self._log(f"\n🔍 분석 중: {self.filename}")
+        by_type = self._collect_by_type()
         
         # 외곽선 크기
-        self._analyze_polylines()
+        self._analyze_polylines(by_type['LWPOLYLINE'])
         
         # 구멍 크기
-        self._analyze_circles()
+        self._analyze_circles(by_type['CIRCLE'])
         
         # 호 크기
-        self._analyze_arcs()
+        self._analyze_arcs(by_type['ARC'])
         
         return self.dimensions
     
-    def _analyze_polylines(self):
-        """폴리라인(외곽선) 분석"""
-        polylines = list(self.msp.query('LWPOLYLINE'))
+    def _log(self, *lines):
+        """진행 메시지 출력 (verbose일 때만, 여러 줄은 한 번에 기록)"""
+        if self.verbose and lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+    
+    def _collect_by_type(self):
+        """
+        모델 공간을 한 번만 순회하며 엔티티를 유형별로 분류
+        (유형마다 msp.query()로 전체를 다시 훑지 않도록 함)
+        
+        Returns:
+            {DXF 유형: [엔티티, ...]} (유형 안에서는 모델 공간 순서 유지, 없는 유형은 빈 리스트)
+        """
+        by_type = defaultdict(list)
+        for entity in self.msp:
+            by_type[entity.dxftype()].append(entity)
+        return by_type
+    
+    def _poly_bbox(self, poly):
+        """
+        폴리라인 경계 상자 (핸들별로 캐시 - 같은 폴리라인의 꼭짓점은 한 번만 훑음)
         
+        Returns:
+            (min_x, min_y, max_x, max_y)
+        """
+        handle = poly.dxf.handle
+        bbox = self._bbox_cache.get(handle)
+        if bbox is None:
+            # 꼭짓점 XY 배열에서 한 번에 최소/최대 계산
+            points = np.asarray(poly.get_points(), dtype=np.float64)[:, :2]
+            mins = points.min(axis=0)
+            maxs = points.max(axis=0)
+            bbox = self._bbox_cache[handle] = (mins[0], mins[1], maxs[0], maxs[1])
+        return bbox
+    
+    def _analyze_polylines(self, polylines):
+        """폴리라인(외곽선) 분석"""
         if polylines:
             # 첫 번째 폴리라인을 주 외곽선으로 간주
-            points = list(polylines[0].get_points())
-            x_coords = [p[0] for p in points]
-            y_coords = [p[1] for p in points]
+            min_x, min_y, max_x, max_y = self._poly_bbox(polylines[0])
             
             self.dimensions['bbox'] = {
-                'min_x': min(x_coords),
-                'max_x': max(x_coords),
-                'min_y': min(y_coords),
-                'max_y': max(y_coords),
-                'width': max(x_coords) - min(x_coords),
-                'height': max(y_coords) - min(y_coords)
+                'min_x': min_x,
+                'max_x': max_x,
+                'min_y': min_y,
+                'max_y': max_y,
+                'width': max_x - min_x,
+                'height': max_y - min_y
             }
             
-            print(f"  📐 외곽선: {self.dimensions['bbox']['width']:.1f} x {self.dimensions['bbox']['height']:.1f} mm")
+            self._log(f"  📐 외곽선: {self.dimensions['bbox']['width']:.1f} x {self.dimensions['bbox']['height']:.1f} mm")
     
-    def _analyze_circles(self):
-        """원(구멍) 분석"""
-        circles = list(self.msp.query('CIRCLE'))
-        
-        self.dimensions['circles'] = []
+    def _analyze_circles(self, circles):
+        """
+        원(구멍) 분석
+        (블록을 분해한 도면처럼 중심/반지름이 같은 원이 겹쳐 있으면
+        소수점 3자리로 반올림한 (x, y, r)을 기준으로 처음 것만 남김 - 겹친 지름 치수 방지)
+        """
+        centers = np.zeros((len(circles), 3))
+        radii = np.empty(len(circles))
+        seen = set()
+        n = 0
         for circle in circles:
-            center = Vec3(circle.dxf.center)
+            center = circle.dxf.center  # 이미 Vec3
             radius = circle.dxf.radius
-            
-            self.dimensions['circles'].append({
-                'center': (center.x, center.y),
-                'radius': radius,
-                'diameter': radius * 2
-            })
-            
-            print(f"  ⭕ 구멍: Ø{radius * 2:.1f} mm @ ({center.x:.1f}, {center.y:.1f})")
+            key = (round(center.x, 3), round(center.y, 3), round(radius, 3))
+            if key in seen:
+                continue
+            seen.add(key)
+            centers[n, :2] = (center.x, center.y)
+            radii[n] = radius
+            n += 1
+        self._circle_centers = centers[:n]
+        self._circle_radii = radii[:n]
+        
+        self.dimensions['circles'] = RecordsView(self._circle_centers, self._circle_radii, with_diameter=True)
+        if n < len(circles):
+            self._log(f"  ⭕ 중복 원 {len(circles) - n}개 제외")
+        if self.verbose:
+            self._log(*[f"  ⭕ 구멍: Ø{r * 2:.1f} mm @ ({x:.1f}, {y:.1f})"
+                        for (x, y, _), r in zip(self._circle_centers.tolist(), self._circle_radii.tolist())])
     
-    def _analyze_arcs(self):
+    def _analyze_arcs(self, arcs):
         """호 분석"""
-        arcs = list(self.msp.query('ARC'))
+        centers = np.zeros((len(arcs), 3))
+        radii = np.empty(len(arcs))
+        for i, arc in enumerate(arcs):
+            center = arc.dxf.center
+            centers[i, :2] = (center.x, center.y)
+            radii[i] = arc.dxf.radius
+        self._arc_centers = centers
+        self._arc_radii = radii
         
-        self.dimensions['arcs'] = []
-        for arc in arcs:
-            center = Vec3(arc.dxf.center)
-            radius = arc.dxf.radius
-            
-            self.dimensions['arcs'].append({
-                'center': (center.x, center.y),
-                'radius': radius
-            })
-            
-            print(f"  🌙 호: R{radius:.1f} mm")
+        self.dimensions['arcs'] = RecordsView(self._arc_centers, self._arc_radii)
+        if self.verbose:
+            self._log(*[f"  🌙 호: R{r:.1f} mm" for r in self._arc_radii.tolist()])
     
-    def add_dimensions_and_save(self, output_file):
-        """분석 결과를 바탕으로 치수 추가 후 저장"""
+    def add_dimensions_and_save(self, output_file, min_feature_ratio=0.0):
+        """
+        분석 결과를 바탕으로 치수 추가 후 저장
+        
+        Parameters:
+            output_file: 출력 DXF 파일 경로
+            min_feature_ratio: 치수 문자 높이(dimtxt) 대비 최소 크기 비율.
+                반지름(원/호) 또는 폭/높이(외곽선)가 dimtxt × 비율보다 작으면
+                문자가 형상을 덮어 쓸모없는 치수이므로 추가/렌더링하지 않음 (0이면 모두 추가)
+        """
         
-        print(f"\n📝 치수 추가 중...")
+        self._log(f"\n📝 치수 추가 중...")
         
         # 스타일 설정
         if 'Standard' not in self.doc.styles:
@@ -110,10 +269,15 @@ class DXFDimensionAnalyzer:
         dimstyle.dxf.dimtxsty = 'Standard'
         dimstyle.dxf.dimdec = 0
         
+        min_size = dimstyle.dxf.dimtxt * min_feature_ratio
+        
+        # 치수 엔티티를 모두 추가한 뒤 한 번에 렌더링
+        pending_dims = []
+        
         # 외곽선 치수
-        if 'bbox' in self.dimensions:
-            bbox = self.dimensions['bbox']
-            
+        bbox = self.dimensions.get('bbox')
+        
+        if bbox is not None and bbox['width'] >= min_size:
             # 수평 치수
             dim_h = self.msp.add_linear_dim(
                 base=(0, bbox['min_y'] - 10, 0),
@@ -121,9 +285,12 @@ class DXFDimensionAnalyzer:
                 p2=(bbox['max_x'], bbox['min_y'], 0),
                 dimstyle='AUTO'
             )
-            dim_h.render()
-            print(f"  ✓ 폭: {bbox['width']:.1f} mm")
-            
+            pending_dims.append(dim_h)
+            self._log(f"  ✓ 폭: {bbox['width']:.1f} mm")
+        elif bbox is not None:
+            self._log(f"  ⏭ 폭: {bbox['width']:.1f} mm - {min_size:.1f} mm 미만이라 치수 생략")
+        
+        if bbox is not None and bbox['height'] >= min_size:
             # 수직 치수
             dim_v = self.msp.add_linear_dim(
                 base=(bbox['min_x'] - 10, 0, 0),
@@ -132,34 +299,46 @@ class DXFDimensionAnalyzer:
                 angle=90,
                 dimstyle='AUTO'
             )
-            dim_v.render()
-            print(f"  ✓ 높이: {bbox['height']:.1f} mm")
+            pending_dims.append(dim_v)
+            self._log(f"  ✓ 높이: {bbox['height']:.1f} mm")
+        elif bbox is not None:
+            self._log(f"  ⏭ 높이: {bbox['height']:.1f} mm - {min_size:.1f} mm 미만이라 치수 생략")
+        
+        # 원/호 치수는 방향(45도)과 스타일이 고정이므로 미리 묶어 둠
+        add_diameter_dim = functools.partial(self.msp.add_diameter_dim, angle=45, dimstyle='AUTO')
+        add_radius_dim = functools.partial(self.msp.add_radius_dim, angle=45, dimstyle='AUTO')
+        
+        # 너무 작은 원/호는 제외
+        circle_keep = self._circle_radii >= min_size
+        arc_keep = self._arc_radii >= min_size
+        circle_radii = self._circle_radii[circle_keep].tolist()
+        arc_radii = self._arc_radii[arc_keep].tolist()
         
         # 원 치수
-        for circle in self.dimensions.get('circles', []):
-            dim_d = self.msp.add_diameter_dim(
-                center=circle['center'] + (0,),
-                radius=circle['radius'],
-                angle=45,
-                dimstyle='AUTO'
-            )
-            dim_d.render()
-            print(f"  ✓ 지름: Ø{circle['diameter']:.1f} mm")
+        for center, radius in zip(self._circle_centers[circle_keep].tolist(), circle_radii):
+            dim_d = add_diameter_dim(center=center, radius=radius)
+            pending_dims.append(dim_d)
+        if self.verbose:
+            self._log(*[f"  ✓ 지름: Ø{radius * 2:.1f} mm" for radius in circle_radii])
         
         # 호 치수
-        for arc in self.dimensions.get('arcs', []):
-            dim_r = self.msp.add_radius_dim(
-                center=arc['center'] + (0,),
-                radius=arc['radius'],
-                angle=45,
-                dimstyle='AUTO'
-            )
-            dim_r.render()
-            print(f"  ✓ 반지름: R{arc['radius']:.1f} mm")
+        for center, radius in zip(self._arc_centers[arc_keep].tolist(), arc_radii):
+            dim_r = add_radius_dim(center=center, radius=radius)
+            pending_dims.append(dim_r)
+        if self.verbose:
+            self._log(*[f"  ✓ 반지름: R{radius:.1f} mm" for radius in arc_radii])
+        
+        skipped = (len(self._circle_radii) - len(circle_radii)) + (len(self._arc_radii) - len(arc_radii))
+        if skipped:
+            self._log(f"  ⏭ {min_size:.1f} mm 미만 원/호 {skipped}개 치수 생략")
+        
+        # 치수 렌더링 (치수 블록 생성)
+        for dim in pending_dims:
+            dim.render()
         
         # 저장
         self.doc.saveas(output_file)
-        print(f"\n✅ 저장 완료: {output_file}")
+        self._log(f"\n✅ 저장 완료: {output_file}")
     
     def print_summary(self):
         """분석 결과 요약 출력"""
@@ -185,18 +364,21 @@ class DXFDimensionAnalyzer:
         print(f"{'='*60}\n")
 
 
-def process_single_file(input_file, output_file):
-    """단일 파일 처리"""
+def process_single_file(input_file, output_file, verbose=True, cache_dir=None, min_feature_ratio=0.0):
+    """
+    단일 파일 처리 (verbose=False면 진행 메시지 없이 요약만 출력, cache_dir는 read_dxf 참고,
+    min_feature_ratio는 add_dimensions_and_save 참고)
+    """
     
     # 1. 분석
-    analyzer = DXFDimensionAnalyzer(input_file)
+    analyzer = DXFDimensionAnalyzer(input_file, verbose=verbose, cache_dir=cache_dir)
     dimensions = analyzer.analyze()
     
     # 2. 요약 출력
     analyzer.print_summary()
     
     # 3. 치수 추가 및 저장
-    analyzer.add_dimensions_and_save(output_file)
+    analyzer.add_dimensions_and_save(output_file, min_feature_ratio=min_feature_ratio)
     
     return dimensions
 
@@ -212,6 +394,8 @@ def main():
   %(prog)s -i input.dxf
   %(prog)s -i input.dxf -o output.dxf
   %(prog)s --input test.dxf --output result.dxf
+  %(prog)s -i input.dxf -q
+  %(prog)s -i input.dxf --min-feature-ratio 0.7
         """
     )
     
@@ -229,6 +413,27 @@ def main():
         help='출력 DXF 파일 경로 (기본값: output.dxf)'
     )
     
+    parser.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help='엔티티별 진행 메시지 생략 (요약만 출력)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        default=None,
+        help='파싱된 DXF 문서 캐시 디렉토리 (같은 파일을 반복 처리할 때 사용)'
+    )
+    
+    parser.add_argument(
+        '--min-feature-ratio',
+        dest='min_feature_ratio',
+        type=float,
+        default=0.0,
+        help='치수 문자 높이 대비 이 비율보다 작은 형상은 치수 생략 (기본값: 0, 모두 추가)'
+    )
+    
     # 인자가 없으면 도움말 표시
     if len(sys.argv) == 1:
         parser.print_help()
@@ -244,7 +449,8 @@ def main():
         print(f"입력 파일: {args.input_file}")
         print(f"출력 파일: {args.output_file}")
         
-        dimensions = process_single_file(args.input_file, args.output_file)
+        dimensions = process_single_file(args.input_file, args.output_file, verbose=not args.quiet,
+                                         cache_dir=args.cache_dir, min_feature_ratio=args.min_feature_ratio)
         
         # 추출된 치수 활용
         if dimensions and 'bbox' in dimensions:
@@ -0,0 +1,71 @@
+"""
+point_grid.py
+점 집합의 격자 공간 색인 (del_demension, chk_demension 공용)
+"""
+
+import numpy as np
+
+
+class PointGrid:
+    """
+    점 집합의 격자 공간 색인 (한 번 만들어 두고 여러 질의점 배열에 재사용)
+    
+    셀 좌표를 정수 키로 바꿔 정렬해 두고, 질의점마다 주변 9개 셀의 구간을
+    searchsorted로 찾음 (NumPy 벡터 연산)
+    """
+    
+    # 질의점 주변 셀 오프셋 (dx, dy ∈ {-1, 0, 1})
+    _NEIGHBOR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    
+    def __init__(self, point_xy, cell_size):
+        """
+        Parameters:
+            point_xy: 검색 대상 점 좌표 배열 (P×2)
+            cell_size: 격자 셀 크기 (검색 반경 이상이어야 함)
+        """
+        self.point_xy = point_xy
+        self.cell_size = cell_size
+        if len(point_xy) == 0:
+            return
+        
+        # 셀 좌표 → 정수 키 (주변 셀용 여유 1칸 - 가장자리 셀은 항상 비어 있음)
+        cells = np.floor(point_xy / cell_size).astype(np.int64)
+        self.origin = cells.min(axis=0) - 1
+        cells -= self.origin
+        self.extent = cells.max(axis=0) + 1
+        self.width = int(self.extent[1]) + 1
+        keys = cells[:, 0] * self.width + cells[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+        self.offsets = np.array([dx * self.width + dy for dx, dy in self._NEIGHBOR_OFFSETS], dtype=np.int64)
+    
+    def neighbors(self, query_xy):
+        """
+        각 질의점이 속한 셀과 주변 8개 셀에 있는 점 찾기
+        (cell_size 이내의 점은 모두 포함됨 - 정확한 거리 검사는 호출하는 쪽에서 수행)
+        
+        Parameters:
+            query_xy: 질의점 좌표 배열 (Q×2)
+        
+        Returns:
+            (q_idx, p_idx) - 질의점 인덱스와 주변 점 인덱스 배열 (같은 쌍은 한 번만 나옴)
+        """
+        if len(query_xy) == 0 or len(self.point_xy) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        
+        # 색인 범위(여유 칸 포함) 밖의 질의점은 주변에 점이 없으므로 제외
+        q_cells = np.floor(query_xy / self.cell_size).astype(np.int64) - self.origin
+        inside = np.flatnonzero(np.all((q_cells >= 0) & (q_cells <= self.extent), axis=1))
+        q_cells = q_cells[inside]
+        q_keys = q_cells[:, 0] * self.width + q_cells[:, 1]
+        
+        # 질의점 × 주변 9개 셀의 정렬된 점 구간 [lo, hi)를 (질의점, 점) 쌍으로 펼침
+        neighbor_keys = (q_keys[:, None] + self.offsets[None, :]).ravel()
+        lo = np.searchsorted(self.sorted_keys, neighbor_keys, side='left')
+        hi = np.searchsorted(self.sorted_keys, neighbor_keys, side='right')
+        counts = hi - lo
+        q_idx = np.repeat(np.repeat(inside, len(self.offsets)), counts)
+        pos = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        
+        return q_idx, self.order[pos]
@@ -1,11 +1,19 @@
-import ezdxf
-from ezdxf.math import Vec3
+import functools
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from ezdxf.enums import TextEntityAlignment
+from ins_demension import read_dxf
 
-def auto_add_dimensions_from_geometry(input_file, output_file):
+def auto_add_dimensions_from_geometry(input_file, output_file, cache_dir=None,
+                                      skip_covered_lines=False):
     """
     DXF 파일의 형상을 분석하여 자동으로 치수 추가
     수치를 미리 알 필요 없이 파일만으로 치수 생성
+    (cache_dir를 주면 파싱된 문서를 캐시해서 반복 실행 시 재사용 - read_dxf 참고)
+    
+    skip_covered_lines=True이면 모든 선이 치수를 넣은 외곽선 안에 있고
+    외곽선 크기의 절반보다 짧을 때 선(LINE) 치수 단계를 건너뜀
     """
     
     print(f"\n{'='*60}")
@@ -13,9 +21,15 @@ def auto_add_dimensions_from_geometry(input_file, output_file):
     print(f"{'='*60}\n")
     
     # 1. 파일 로드
-    doc = ezdxf.readfile(input_file)
+    doc = read_dxf(input_file, cache_dir)
     msp = doc.modelspace()
     
+    # 모델 공간을 한 번만 순회하며 형상 엔티티를 유형별로 분류
+    # (이후 단계는 DIMENSION/MTEXT만 추가하므로 분류 결과가 그대로 유효함)
+    by_type = defaultdict(list)
+    for entity in msp:
+        by_type[entity.dxftype()].append(entity)
+    
     # 2. 텍스트 스타일 설정
     if 'Standard' not in doc.styles:
         doc.styles.new('Standard', dxfattribs={'font': 'arial.ttf'})
@@ -31,133 +45,151 @@ def auto_add_dimensions_from_geometry(input_file, output_file):
     dimstyle.dxf.dimtxsty = 'Standard'
     dimstyle.dxf.dimdec = 0
     
+    # 치수 엔티티를 모두 추가한 뒤 한 번에 렌더링
+    pending_dims = []
+    
+    # 치수 생성 함수에 스타일(과 원의 45도 방향)을 미리 묶어 둠
+    add_linear_dim = functools.partial(msp.add_linear_dim, dimstyle='AUTO_DIM')
+    add_diameter_dim = functools.partial(msp.add_diameter_dim, angle=45, dimstyle='AUTO_DIM')
+    add_radius_dim = functools.partial(msp.add_radius_dim, dimstyle='AUTO_DIM')
+    
     # 4. 폴리라인(외곽선) 찾기 및 치수 추가
-    polylines = list(msp.query('LWPOLYLINE'))
+    polylines = by_type['LWPOLYLINE']
+    poly_bboxes = []  # 치수를 넣은 외곽선의 (min_x, min_y, max_x, max_y)
     
     if polylines:
         print("✅ 폴리라인 발견 - 외곽선 치수 추가 중...")
         
         for poly in polylines:
-            points = list(poly.get_points())
-            
-            # 경계 계산
-            x_coords = [p[0] for p in points]
-            y_coords = [p[1] for p in points]
-            
-            min_x, max_x = min(x_coords), max(x_coords)
-            min_y, max_y = min(y_coords), max(y_coords)
+            # 경계 계산 (꼭짓점 XY 배열에서 한 번에 최소/최대 계산)
+            points = np.asarray(poly.get_points(), dtype=np.float64)[:, :2]
+            min_x, min_y = points.min(axis=0)
+            max_x, max_y = points.max(axis=0)
             
             width = max_x - min_x
             height = max_y - min_y
             
             print(f"  감지된 크기: {width:.1f} x {height:.1f} mm")
             
+            if width > 1 or height > 1:
+                poly_bboxes.append((min_x, min_y, max_x, max_y))
+            
             # 수평 치수 (하단)
             if width > 1:  # 1mm 이상만
-                dim_h = msp.add_linear_dim(
+                dim_h = add_linear_dim(
                     base=(min_x + width/2, min_y - 10, 0),
                     p1=(min_x, min_y, 0),
-                    p2=(max_x, min_y, 0),
-                    dimstyle='AUTO_DIM'
+                    p2=(max_x, min_y, 0)
                 )
-                dim_h.render()
+                pending_dims.append(dim_h)
                 print(f"    ✓ 수평 치수 추가: {width:.1f} mm")
             
             # 수직 치수 (좌측)
             if height > 1:
-                dim_v = msp.add_linear_dim(
+                dim_v = add_linear_dim(
                     base=(min_x - 10, min_y + height/2, 0),
                     p1=(min_x, min_y, 0),
                     p2=(min_x, max_y, 0),
-                    angle=90,
-                    dimstyle='AUTO_DIM'
+                    angle=90
                 )
-                dim_v.render()
+                pending_dims.append(dim_v)
                 print(f"    ✓ 수직 치수 추가: {height:.1f} mm")
     
     # 5. 원(구멍) 찾기 및 치수 추가
-    circles = list(msp.query('CIRCLE'))
+    circles = by_type['CIRCLE']
     
     if circles:
         print("\n✅ 원 발견 - 지름 치수 추가 중...")
         
         for i, circle in enumerate(circles):
-            center = Vec3(circle.dxf.center)
+            center = circle.dxf.center  # 이미 Vec3
             radius = circle.dxf.radius
             diameter = radius * 2
             
             print(f"  원 {i+1}: 지름 {diameter:.1f} mm")
             
             # 지름 치수 추가
-            dim_d = msp.add_diameter_dim(
-                center=(center.x, center.y, 0),
-                radius=radius,
-                angle=45,  # 45도 방향
-                dimstyle='AUTO_DIM'
-            )
-            dim_d.render()
+            dim_d = add_diameter_dim(center=(center.x, center.y, 0), radius=radius)
+            pending_dims.append(dim_d)
             print(f"    ✓ 지름 치수 추가: Ø{diameter:.1f} mm")
     
     # 6. 호(Arc) 찾기 및 치수 추가
-    arcs = list(msp.query('ARC'))
+    arcs = by_type['ARC']
     
     if arcs:
         print("\n✅ 호 발견 - 반지름 치수 추가 중...")
         
         for i, arc in enumerate(arcs):
-            center = Vec3(arc.dxf.center)
+            center = arc.dxf.center
             radius = arc.dxf.radius
             
             print(f"  호 {i+1}: 반지름 {radius:.1f} mm")
             
             # 반지름 치수 추가
-            dim_r = msp.add_radius_dim(
-                center=(center.x, center.y, 0),
-                radius=radius,
-                angle=arc.dxf.start_angle,
-                dimstyle='AUTO_DIM'
-            )
-            dim_r.render()
+            dim_r = add_radius_dim(center=(center.x, center.y, 0), radius=radius,
+                                   angle=arc.dxf.start_angle)
+            pending_dims.append(dim_r)
             print(f"    ✓ 반지름 치수 추가: R{radius:.1f} mm")
     
     # 7. 개별 선(LINE) 분석 - 주요 선만
-    lines = list(msp.query('LINE'))
+    lines = by_type['LINE']
     
     if lines:
         print(f"\n✅ 선 {len(lines)}개 발견")
         
-        # 긴 수평선/수직선만 치수 추가
-        for line in lines:
-            start = Vec3(line.dxf.start)
-            end = Vec3(line.dxf.end)
-            length = start.distance(end)
-            
-            # 10mm 이상의 선만 치수 추가
-            if length < 10:
-                continue
-            
-            # 수평선
-            if abs(start.y - end.y) < 0.1:
-                dim = msp.add_linear_dim(
-                    base=((start.x + end.x)/2, start.y - 5, 0),
-                    p1=start,
-                    p2=end,
-                    dimstyle='AUTO_DIM'
-                )
-                dim.render()
-                print(f"    ✓ 수평선 치수: {length:.1f} mm")
-            
-            # 수직선
-            elif abs(start.x - end.x) < 0.1:
-                dim = msp.add_linear_dim(
-                    base=(start.x - 5, (start.y + end.y)/2, 0),
-                    p1=start,
-                    p2=end,
-                    angle=90,
-                    dimstyle='AUTO_DIM'
-                )
-                dim.render()
-                print(f"    ✓ 수직선 치수: {length:.1f} mm")
+        # 시작점/끝점 좌표 배열로 길이와 방향을 한 번에 판정
+        starts = np.array([tuple(line.dxf.start) for line in lines], dtype=np.float64).reshape(-1, 3)
+        ends = np.array([tuple(line.dxf.end) for line in lines], dtype=np.float64).reshape(-1, 3)
+        d = starts - ends
+        lengths = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] + d[:, 2] * d[:, 2])
+        is_h = np.abs(d[:, 1]) < 0.1
+        is_v = np.abs(d[:, 0]) < 0.1
+        
+        # 긴 수평선/수직선만 치수 추가 (10mm 이상의 선만)
+        keep = np.flatnonzero((lengths >= 10) & (is_h | is_v))
+        
+        # 선 전체의 경계 상자가 한 외곽선 경계 상자 안에 들어가고
+        # 가장 긴 선도 외곽선 크기의 절반 미만이면 외곽선 치수로 충분하다고 보고 생략
+        if skip_covered_lines and poly_bboxes:
+            xy = np.concatenate((starts[:, :2], ends[:, :2]))
+            lx0, ly0 = xy.min(axis=0)
+            lx1, ly1 = xy.max(axis=0)
+            max_length = lengths.max()
+            for px0, py0, px1, py1 in poly_bboxes:
+                if (px0 <= lx0 and py0 <= ly0 and lx1 <= px1 and ly1 <= py1
+                        and max_length < max(px1 - px0, py1 - py0) * 0.5):
+                    print("  외곽선 안의 짧은 선뿐이므로 선 치수 생략")
+                    keep = keep[:0]
+                    break
+        
+        horizontal = is_h[keep]
+        
+        # 방향별 치수 기준점/각도도 배열로 한 번에 계산
+        # 수평선: 중점 아래 5mm, 0도 / 수직선: 시작점 왼쪽 5mm, 90도
+        sx, sy = starts[keep, 0], starts[keep, 1]
+        ex, ey = ends[keep, 0], ends[keep, 1]
+        base_x = np.where(horizontal, (sx + ex)/2, sx - 5)
+        base_y = np.where(horizontal, sy - 5, (sy + ey)/2)
+        angles = np.where(horizontal, 0, 90)
+        labels = np.where(horizontal, '수평선', '수직선')
+        
+        messages = []  # 선마다 print하지 않고 끝에서 한 번에 출력
+        for i, bx, by, angle, label in zip(keep.tolist(), base_x.tolist(), base_y.tolist(),
+                                           angles.tolist(), labels.tolist()):
+            dim = add_linear_dim(
+                base=(bx, by, 0),
+                p1=tuple(starts[i].tolist()),
+                p2=tuple(ends[i].tolist()),
+                angle=angle
+            )
+            pending_dims.append(dim)
+            messages.append(f"    ✓ {label} 치수: {lengths[i]:.1f} mm")
+        if messages:
+            print('\n'.join(messages))
+    
+    # 치수 렌더링 (치수 블록 생성)
+    for dim in pending_dims:
+        dim.render()
     
     # 8. 정보 텍스트 추가
     info_text = msp.add_mtext(
@@ -180,8 +212,12 @@ def auto_add_dimensions_from_geometry(input_file, output_file):
     print(f"{'='*60}\n")
 
 
-def analyze_and_dimension_all_views():
-    """3개 뷰 모두 자동 분석 및 치수 추가"""
+def analyze_and_dimension_all_views(cache_dir=None, skip_covered_lines=False):
+    """
+    3개 뷰 모두 자동 분석 및 치수 추가
+    (뷰 파일은 서로 독립이므로 프로세스 풀에서 동시에 처리 - 메모리는 뷰 개수만큼 필요함)
+    (cache_dir, skip_covered_lines는 auto_add_dimensions_from_geometry 참고)
+    """
     
     files = [
         ('test_part_top.dxf', 'test_part_top_auto_dim.dxf', '평면도'),
@@ -193,14 +229,21 @@ def analyze_and_dimension_all_views():
     print("🤖 자동 치수 추가 시작 (3개 뷰)")
     print("="*60)
     
-    for input_file, output_file, view_name in files:
-        try:
+    with ProcessPoolExecutor(max_workers=len(files)) as executor:
+        futures = []
+        for input_file, output_file, view_name in files:
             print(f"\n📋 처리 중: {view_name}")
-            auto_add_dimensions_from_geometry(input_file, output_file)
-        except FileNotFoundError:
-            print(f"⚠️ 파일 없음: {input_file}")
-        except Exception as e:
-            print(f"❌ 오류: {e}")
+            futures.append(executor.submit(auto_add_dimensions_from_geometry, input_file, output_file,
+                                           cache_dir, skip_covered_lines))
+        
+        # 결과(오류)는 뷰 순서대로 확인
+        for (input_file, output_file, view_name), future in zip(files, futures):
+            try:
+                future.result()
+            except FileNotFoundError:
+                print(f"⚠️ 파일 없음: {input_file}")
+            except Exception as e:
+                print(f"❌ 오류: {e}")
     
     print("\n" + "="*60)
     print("🎉 모든 뷰 처리 완료!")